@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialize_doc + jsonable_encoder vs projected documents through orjson
+Run from the backend directory: python benchmarks/bench_json.py
+"""
+
+import random
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from responses import FastJSONResponse
+
+DOC_COUNTS = [50, 100, 500]
+
+
+def serialize_doc(doc):
+    """The previous recursive walk, as server.py used it on every read endpoint"""
+    if doc is None:
+        return None
+    if isinstance(doc, list):
+        return [serialize_doc(item) for item in doc]
+    if isinstance(doc, dict):
+        result = {}
+        for key, value in doc.items():
+            if key == '_id':
+                continue
+            elif isinstance(value, ObjectId):
+                result[key] = str(value)
+            elif isinstance(value, list):
+                result[key] = [serialize_doc(item) for item in value]
+            elif isinstance(value, dict):
+                result[key] = serialize_doc(value)
+            else:
+                result[key] = value
+        return result
+    return doc
+
+
+def fake_result():
+    """A results document with per-image breakdowns, as GameResult stores it"""
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": str(uuid.uuid4()),
+        "game_id": str(uuid.uuid4()),
+        "player_name": f"Player {random.randint(1, 999)}",
+        "team_name": "Alpha",
+        "total_score": random.randint(0, 150),
+        "total_risks_found": random.randint(0, 15),
+        "total_time_spent": random.randint(30, 300),
+        "total_clicks_used": random.randint(1, 17),
+        "image_results": [
+            {"image_id": str(uuid.uuid4()), "risks_found": random.randint(0, 5), "clicks": random.randint(0, 10)}
+            for _ in range(3)
+        ],
+        "created_at": datetime.utcnow(),
+    }
+
+
+def main():
+    random.seed(42)
+    print(f"{'docs':>5} | {'before us':>9} | {'after us':>8} | {'speedup':>7}")
+    print("-" * 40)
+    for count in DOC_COUNTS:
+        projected = [fake_result() for _ in range(count)]
+        # What find() returned without a projection
+        stored = [{"_id": ObjectId(), **doc} for doc in projected]
+
+        # Both paths must produce the same JSON before timing means anything
+        before_body = JSONResponse(jsonable_encoder(serialize_doc(stored))).body
+        after_body = FastJSONResponse(projected).body
+        assert before_body == after_body
+
+        before = min(timeit.repeat(
+            lambda: JSONResponse(jsonable_encoder(serialize_doc(stored))), number=20, repeat=5
+        )) / 20
+        after = min(timeit.repeat(lambda: FastJSONResponse(projected), number=20, repeat=5)) / 20
+        print(f"{count:>5} | {before * 1e6:>9.0f} | {after * 1e6:>8.0f} | {before / after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
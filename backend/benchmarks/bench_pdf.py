@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PDF report drawn on the event loop vs in the report process pool
+Run from the backend directory: python benchmarks/bench_pdf.py
+"""
+
+import asyncio
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from exports import report_pool, write_pdf
+
+ROW_COUNTS = [1000, 10000, 50000]
+HEARTBEAT_INTERVAL = 0.005
+
+
+def fake_results(count):
+    return [{
+        "player_name": f"Player {i}",
+        "team_name": random.choice(["Alpha", "Bravo", "Charlie"]),
+        "total_score": random.randint(0, 150),
+        "total_risks_found": random.randint(0, 15),
+        "total_time_spent": random.randint(30, 300),
+        "total_clicks_used": random.randint(1, 17),
+        "created_at": datetime.utcnow(),
+    } for i in range(count)]
+
+
+async def cursor(results, batch_size=1000):
+    """Yields to the event loop between batches, like a Motor cursor fetching them"""
+    for i, result in enumerate(results):
+        if i % batch_size == 0:
+            await asyncio.sleep(0)
+        yield result
+
+
+def legacy_report(results, title):
+    """The previous inline loop: one drawString per cell, on the event loop"""
+    output = io.BytesIO()
+    doc = canvas.Canvas(output, pagesize=letter)
+    width, height = letter
+    doc.setFont("Helvetica-Bold", 16)
+    doc.drawString(50, height - 50, title)
+    doc.setFont("Helvetica-Bold", 10)
+    y_position = height - 100
+    x_positions = [50, 130, 190, 240, 290, 340, 390]
+    for i, header in enumerate(["Player", "Team", "Score", "Risks", "Time", "Clicks", "Date"]):
+        doc.drawString(x_positions[i], y_position, header)
+    doc.setFont("Helvetica", 9)
+    y_position -= 20
+    for result in results:
+        if y_position < 50:
+            doc.showPage()
+            y_position = height - 50
+        data = [
+            result.get("player_name", "")[:15],
+            result.get("team_name", "")[:10],
+            str(result.get("total_score", 0)),
+            str(result.get("total_risks_found", 0)),
+            str(result.get("total_time_spent", 0)),
+            str(result.get("total_clicks_used", 0)),
+            str(result.get("created_at", ""))[:10],
+        ]
+        for i, value in enumerate(data):
+            doc.drawString(x_positions[i], y_position, str(value))
+        y_position -= 15
+    doc.save()
+    return output.getvalue()
+
+
+async def measure(render):
+    """(wall time, longest event loop stall) while `render` runs"""
+    stalls = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            expected = time.perf_counter() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            stalls.append(time.perf_counter() - expected)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await render()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+    return elapsed, max(stalls, default=0.0)
+
+
+async def main():
+    random.seed(42)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+
+    # Start the worker process before timing anything
+    await write_pdf(cursor(fake_results(10)), path, "warm up")
+
+    print(f"{'rows':>6} | {'inline s':>8} | {'inline stall ms':>15} | {'pool s':>6} | {'pool stall ms':>13}")
+    print("-" * 62)
+    for count in ROW_COUNTS:
+        results = fake_results(count)
+
+        async def inline():
+            legacy_report(results, "Game Results Report - bench")
+
+        async def pooled():
+            await write_pdf(cursor(results), path, "Game Results Report - bench")
+
+        inline_time, inline_stall = await measure(inline)
+        pool_time, pool_stall = await measure(pooled)
+        print(f"{count:>6} | {inline_time:>8.2f} | {inline_stall * 1000:>15.1f} | "
+              f"{pool_time:>6.2f} | {pool_stall * 1000:>13.1f}")
+
+    os.unlink(path)
+    report_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: NumPy point-in-polygon vs a pure-Python edge loop
+Run from the backend directory: python benchmarks/bench_polygon.py
+"""
+
+import math
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hit_testing import CompiledZones, NUMPY_MIN_VERTICES, polygon_arrays, point_in_polygon, point_in_polygon_python
+
+VERTEX_COUNTS = [8, 32, 128, 512, 2048]
+CLICKS = 2000
+
+
+def machinery_outline(vertex_count, cx=400.0, cy=300.0, radius=200.0):
+    """Irregular star-shaped outline, like a traced machine silhouette"""
+    coordinates = []
+    for i in range(vertex_count):
+        angle = 2 * math.pi * i / vertex_count
+        r = radius * (0.6 + 0.4 * random.random())
+        coordinates += [cx + r * math.cos(angle), cy + r * math.sin(angle)]
+    return coordinates
+
+
+def main():
+    random.seed(42)
+    clicks = [(random.uniform(150, 650), random.uniform(50, 550)) for _ in range(CLICKS)]
+
+    print(f"{'vertices':>8} | {'python us/click':>15} | {'numpy us/click':>14} | {'speedup':>7}")
+    print("-" * 55)
+    for vertex_count in VERTEX_COUNTS:
+        coordinates = machinery_outline(vertex_count)
+        polygon = polygon_arrays(coordinates)
+
+        # Both implementations must agree before timing means anything
+        for x, y in clicks:
+            assert point_in_polygon(polygon, x, y) == point_in_polygon_python(coordinates, x, y)
+
+        python_time = min(timeit.repeat(
+            lambda: [point_in_polygon_python(coordinates, x, y) for x, y in clicks], number=1, repeat=5
+        ))
+        numpy_time = min(timeit.repeat(
+            lambda: [point_in_polygon(polygon, x, y) for x, y in clicks], number=1, repeat=5
+        ))
+        print(f"{vertex_count:>8} | {python_time / CLICKS * 1e6:>15.2f} | "
+              f"{numpy_time / CLICKS * 1e6:>14.2f} | {python_time / numpy_time:>6.1f}x")
+
+    # End to end through the compiled grid, as handle_click uses it
+    zones = CompiledZones([{"id": "outline", "type": "polygon", "coordinates": machinery_outline(512)}])
+    total = min(timeit.repeat(lambda: [zones.hit(x, y) for x, y in clicks], number=1, repeat=5))
+    print(f"\nCompiledZones vectorizes polygons with {NUMPY_MIN_VERTICES}+ vertices")
+    print(f"CompiledZones.hit, 512-vertex polygon: {total / CLICKS * 1e6:.2f} us/click")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Content-addressed storage for image bytes.
+
+Blobs are keyed by the SHA-256 of their content, so identical uploads are
+stored once. Two backends are available: GridFS (default, lives next to the
+rest of the data) and a local filesystem directory.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, UpdateOne, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+
+# Size of the pieces handed to the client when streaming a blob
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# How long a writer that lost an upload race waits for the winner to finish
+RACE_WAIT_SECONDS = 60
+RACE_POLL_INTERVAL = 0.2
+
+
+def content_hash(data: bytes) -> str:
+    """Return the hex SHA-256 used as a blob key"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobStore:
+    """Interface shared by all blob backends"""
+
+    async def put(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    async def put_stream(self, blob_hash: str, open_chunks: Callable[[], AsyncIterator[bytes]]) -> None:
+        """Store the chunks yielded by open_chunks(), whose combined SHA-256 the caller already computed.
+
+        open_chunks may be called a second time to retry a failed upload.
+        """
+        raise NotImplementedError
+
+    async def exists(self, blob_hash: str) -> bool:
+        raise NotImplementedError
+
+    async def read(self, blob_hash: str) -> bytes:
+        raise NotImplementedError
+
+    async def stat(self, blob_hash: str) -> int:
+        """Return the blob size in bytes"""
+        raise NotImplementedError
+
+    def stream(self, blob_hash: str, start: int = 0, end: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the bytes in [start, end) in chunks of at most chunk_size"""
+        raise NotImplementedError
+
+    async def delete(self, blob_hash: str) -> None:
+        raise NotImplementedError
+
+
+class GridFSBlobStore(BlobStore):
+    def __init__(self, db, bucket_name: str = "blobs"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+        self.chunks = db[f"{bucket_name}.chunks"]
+
+    async def put(self, data: bytes) -> str:
+        blob_hash = content_hash(data)
+        if await self.exists(blob_hash):
+            return blob_hash
+        for attempt in range(2):
+            try:
+                await self.bucket.upload_from_stream_with_id(blob_hash, blob_hash, data)
+                return blob_hash
+            except DuplicateKeyError:
+                # A concurrent upload of the same content won the race, or a crashed one left chunks
+                if await self._wait_for(blob_hash, clear_orphans=attempt == 0):
+                    return blob_hash
+        raise BlobNotFound(blob_hash)
+
+    async def put_stream(self, blob_hash: str, open_chunks: Callable[[], AsyncIterator[bytes]]) -> None:
+        if await self.exists(blob_hash):
+            return
+        for attempt in range(2):
+            grid_in = self.bucket.open_upload_stream_with_id(blob_hash, blob_hash)
+            try:
+                async for chunk in open_chunks():
+                    await grid_in.write(chunk)
+                await grid_in.close()
+                return
+            except DuplicateKeyError:
+                # A concurrent upload of the same content won the race. Both write chunk 0 first,
+                # so this one has written nothing; abort() would delete the other upload's chunks
+                # and file document, which share our id. Just give up the stream and wait for it.
+                object.__setattr__(grid_in.delegate, "_closed", True)
+                if await self._wait_for(blob_hash, clear_orphans=attempt == 0):
+                    return
+            except BaseException:
+                await grid_in.abort()
+                raise
+        raise BlobNotFound(blob_hash)
+
+    async def _wait_for(self, blob_hash: str, clear_orphans: bool) -> bool:
+        """Wait for a concurrent upload of blob_hash to finish, so callers can read it on return.
+
+        Returns False if it never does. Then the chunks were left behind by an
+        upload that died before writing its file document; with clear_orphans
+        they are deleted, as they would otherwise block this content for good.
+        """
+        for _ in range(int(RACE_WAIT_SECONDS / RACE_POLL_INTERVAL)):
+            if await self.exists(blob_hash):
+                return True
+            await asyncio.sleep(RACE_POLL_INTERVAL)
+        if clear_orphans and not await self.exists(blob_hash):
+            await self.chunks.delete_many({"files_id": blob_hash})
+        return False
+
+    async def exists(self, blob_hash: str) -> bool:
+        return await self.files.count_documents({"_id": blob_hash}, limit=1) > 0
+
+    async def read(self, blob_hash: str) -> bytes:
+        try:
+            grid_out = await self.bucket.open_download_stream(blob_hash)
+        except NoFile:
+            raise BlobNotFound(blob_hash)
+        return await grid_out.read()
+
+    async def stat(self, blob_hash: str) -> int:
+        doc = await self.files.find_one({"_id": blob_hash}, {"length": 1})
+        if doc is None:
+            raise BlobNotFound(blob_hash)
+        return doc["length"]
+
+    async def stream(self, blob_hash: str, start: int = 0, end: Optional[int] = None,
+                     chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self.bucket.open_download_stream(blob_hash)
+        except NoFile:
+            raise BlobNotFound(blob_hash)
+        end = grid_out.length if end is None else end
+        grid_out.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = await grid_out.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, blob_hash: str) -> None:
+        try:
+            await self.bucket.delete(blob_hash)
+        except NoFile:
+            pass
+
+
+class FileSystemBlobStore(BlobStore):
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, blob_hash: str) -> Path:
+        # Shard by the first two bytes to keep directories small
+        return self.root / blob_hash[:2] / blob_hash[2:4] / blob_hash
+
+    def _write(self, blob_hash: str, data: bytes) -> None:
+        path = self._path(blob_hash)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def put(self, data: bytes) -> str:
+        blob_hash = content_hash(data)
+        await asyncio.to_thread(self._write, blob_hash, data)
+        return blob_hash
+
+    async def put_stream(self, blob_hash: str, open_chunks: Callable[[], AsyncIterator[bytes]]) -> None:
+        path = self._path(blob_hash)
+        if await self.exists(blob_hash):
+            return
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in open_chunks():
+                    await asyncio.to_thread(f.write, chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def exists(self, blob_hash: str) -> bool:
+        return await asyncio.to_thread(self._path(blob_hash).exists)
+
+    async def read(self, blob_hash: str) -> bytes:
+        try:
+            return await asyncio.to_thread(self._path(blob_hash).read_bytes)
+        except FileNotFoundError:
+            raise BlobNotFound(blob_hash)
+
+    async def stat(self, blob_hash: str) -> int:
+        try:
+            return (await asyncio.to_thread(self._path(blob_hash).stat)).st_size
+        except FileNotFoundError:
+            raise BlobNotFound(blob_hash)
+
+    async def stream(self, blob_hash: str, start: int = 0, end: Optional[int] = None,
+                     chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        try:
+            f = await asyncio.to_thread(open, self._path(blob_hash), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(blob_hash)
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, blob_hash: str) -> None:
+        try:
+            await asyncio.to_thread(self._path(blob_hash).unlink)
+        except FileNotFoundError:
+            pass
+
+
+class BlobRefCounter:
+    """Reference counts for blobs shared by several image documents.
+
+    Duplicating an image only increments the counts of its blobs; the bytes
+    are deleted from the store when the last reference is released.
+
+    Writers acquire before putting a blob. While the bytes of a released blob
+    are being deleted its counter carries `deleting: true`, and acquire waits
+    for that deletion to finish, so the put that follows sees the blob gone
+    and writes it again instead of skipping it as already stored.
+    """
+
+    def __init__(self, collection, store: BlobStore):
+        self.collection = collection
+        self.store = store
+
+    async def acquire(self, hashes) -> None:
+        await self.acquire_counts({blob_hash: 1 for blob_hash in hashes})
+
+    async def acquire_counts(self, counts: dict) -> None:
+        """Add several references at once from a {blob_hash: count} mapping"""
+        updates = [
+            UpdateOne({"_id": blob_hash}, {"$inc": {"refs": count}}, upsert=True)
+            for blob_hash, count in counts.items() if blob_hash
+        ]
+        if not updates:
+            return
+        await self.collection.bulk_write(updates, ordered=False)
+
+        hashes = [blob_hash for blob_hash in counts if blob_hash]
+        for _ in range(int(RACE_WAIT_SECONDS / RACE_POLL_INTERVAL)):
+            if not await self.collection.find_one({"_id": {"$in": hashes}, "deleting": True}, {"_id": 1}):
+                return
+            await asyncio.sleep(RACE_POLL_INTERVAL)
+        # The releasing worker died mid-delete; the caller's put rewrites whatever is missing
+        await self.collection.update_many({"_id": {"$in": hashes}, "deleting": True}, {"$unset": {"deleting": ""}})
+
+    async def release(self, hashes) -> None:
+        for blob_hash in hashes:
+            if not blob_hash:
+                continue
+            doc = await self.collection.find_one_and_update(
+                {"_id": blob_hash},
+                {"$inc": {"refs": -1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None or doc["refs"] > 0:
+                continue
+            # Only the caller that claims the deletion removes the bytes
+            claimed = await self.collection.find_one_and_update(
+                {"_id": blob_hash, "refs": {"$lte": 0}, "deleting": {"$ne": True}},
+                {"$set": {"deleting": True}}
+            )
+            if claimed is None:
+                continue
+            await self.store.delete(blob_hash)
+            # Bytes first, counter second: a writer that acquired meanwhile is waiting on the
+            # flag and re-puts the blob once it is cleared
+            removed = await self.collection.delete_one({"_id": blob_hash, "refs": {"$lte": 0}})
+            if not removed.deleted_count:
+                await self.collection.update_one({"_id": blob_hash}, {"$unset": {"deleting": ""}})
+
+    async def rebuild(self, counts: dict) -> None:
+        """Replace every counter with the given {blob_hash: refs} mapping"""
+        if counts:
+            await self.collection.bulk_write(
+                [ReplaceOne({"_id": blob_hash}, {"refs": refs}, upsert=True) for blob_hash, refs in counts.items()],
+                ordered=False
+            )
+        await self.collection.delete_many({"_id": {"$nin": list(counts)}})
+
+
+def create_blob_store(db) -> BlobStore:
+    """Build the blob store selected by the BLOB_STORE environment variable"""
+    backend = os.environ.get("BLOB_STORE", "gridfs")
+    if backend == "gridfs":
+        return GridFSBlobStore(db)
+    if backend == "filesystem":
+        return FileSystemBlobStore(os.environ.get("BLOB_STORE_PATH", "/app/blobs"))
+    raise ValueError(f"Unknown BLOB_STORE backend: {backend}")
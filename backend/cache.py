@@ -0,0 +1,209 @@
+"""In-process caches for data that is read far more often than it changes.
+
+A ReadThroughCache loads missing entries through a coroutine, counts hits
+and misses, and stores entries in a pluggable backend selected with the
+CACHE_BACKEND environment variable.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Storage interface shared by all cache backends"""
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0
+
+
+class NullCache(CacheBackend):
+    """Stores nothing; every read goes to the loader"""
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class TTLCache(CacheBackend):
+    """Small LRU where every entry also expires after `ttl` seconds (None = never)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[key]
+            return default
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def create_backend(maxsize: int, ttl: Optional[float]) -> CacheBackend:
+    """Build the cache backend selected by the CACHE_BACKEND environment variable"""
+    backend = os.environ.get("CACHE_BACKEND", "memory")
+    if backend == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+
+class ReadThroughCache:
+    """Cache in front of an async loader, with hit/miss counters.
+
+    Loaders return None for missing documents; those results are not cached
+    so a document created later is found on the next read.
+    """
+
+    def __init__(self, name: str, loader: Callable[[Hashable], Awaitable[Any]], backend: CacheBackend):
+        self.name = name
+        self.loader = loader
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped on every write so a slow load cannot overwrite newer data
+        self.generation = 0
+
+    async def get(self, key: Hashable) -> Any:
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        generation = self.generation
+        value = await self.loader(key)
+        # A write or invalidation while loading means the value may already be stale
+        if value is not None and generation == self.generation:
+            self.backend.set(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value the caller just wrote, sparing the next read a miss"""
+        self.generation += 1
+        self.backend.set(key, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+class VersionTable:
+    """Cross-worker cache coherence through a small MongoDB collection.
+
+    Writers bump a per-key version document; every worker polls for documents
+    changed since its last poll and invalidates the matching local entries, so
+    a cached value is stale for at most one poll interval. Polling is used
+    instead of change streams because those need a replica set.
+    """
+
+    # Re-read this many seconds of history on each poll so writes that became
+    # visible slightly out of timestamp order are not missed
+    OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, collection, on_change: Callable[[str], None]):
+        self.collection = collection
+        self.on_change = on_change
+        self.seen: dict = {}
+        self.last_seen_at: Optional[datetime] = None
+
+    async def bump(self, key: str) -> None:
+        await self.collection.update_one(
+            {"_id": key},
+            {"$inc": {"version": 1}, "$currentDate": {"changed_at": True}},
+            upsert=True
+        )
+
+    async def poll(self) -> int:
+        """Invalidate keys changed by any worker since the last poll; returns how many"""
+        query = {}
+        if self.last_seen_at is not None:
+            query = {"changed_at": {"$gte": self.last_seen_at - self.OVERLAP}}
+        changed = 0
+        async for doc in self.collection.find(query):
+            key, version = doc["_id"], doc["version"]
+            if self.seen.get(key) != version:
+                # The first poll only learns the current versions; local caches start empty
+                if self.last_seen_at is not None:
+                    self.on_change(key)
+                    changed += 1
+                self.seen[key] = version
+            if self.last_seen_at is None or doc["changed_at"] > self.last_seen_at:
+                self.last_seen_at = doc["changed_at"]
+        if self.last_seen_at is None:
+            self.last_seen_at = datetime.min + self.OVERLAP
+        return changed
+
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Cache version poll failed")
+            await asyncio.sleep(interval)
@@ -0,0 +1,256 @@
+"""Background export jobs with cached artifacts.
+
+POST /api/exports queues a job that runs in a small pool of background tasks,
+records its progress on the job document and stores the finished file in the
+blob store. Finished files are kept as artifacts keyed by game, format and
+results version, so exporting an unchanged game again is served from the
+artifact instead of being regenerated.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from exports import EXPORT_PROJECTION, FORMATS
+from game_stats import load_game_stats, summarize
+
+logger = logging.getLogger(__name__)
+
+# Rows between two progress updates on the job document
+PROGRESS_EVERY = 1000
+FILE_CHUNK_SIZE = 1024 * 1024
+
+# Workers refresh heartbeat_at on their unfinished jobs; a job whose heartbeat is
+# older than STALE_AFTER belonged to a worker that died and is reported as failed
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(seconds=3 * HEARTBEAT_INTERVAL)
+
+
+def artifact_filename(game_id: str, format: str) -> str:
+    return f"game_results_{game_id}.{FORMATS[format].extension}"
+
+
+async def _file_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExportJobs:
+    def __init__(self, db, store, refs, workers: int = 2):
+        self.db = db
+        self.store = store
+        self.refs = refs
+        self.jobs = db.export_jobs
+        self.artifacts = db.export_artifacts
+        # Bounds how many exports generate at once; the rest wait queued
+        self.slots = asyncio.Semaphore(workers)
+        # job id -> task, for the jobs of this worker that have not finished
+        self.tasks = {}
+
+    async def results_version(self, game_id: str) -> str:
+        """Changes whenever a result is recorded for the game (or any game, for "all")"""
+        if game_id == "all":
+            stats = await self.db.game_stats.aggregate([
+                {"$group": {"_id": None, "count": {"$sum": "$count"}, "updated_at": {"$max": "$updated_at"}}}
+            ]).to_list(1)
+            stats = stats[0] if stats else None
+        else:
+            stats = await load_game_stats(self.db, game_id)
+        if not stats or not stats.get("updated_at"):
+            return "0"
+        return f"{stats['count']}-{stats['updated_at'].isoformat()}"
+
+    async def cached_artifact(self, game_id: str, format: str, version: Optional[str] = None) -> Optional[dict]:
+        version = version or await self.results_version(game_id)
+        return await self.artifacts.find_one({"_id": f"{game_id}:{format}:{version}"})
+
+    async def submit(self, game_id: str, format: str) -> dict:
+        """Create a job; it is already completed when a cached artifact matches"""
+        version = await self.results_version(game_id)
+        job = {
+            "id": str(uuid.uuid4()),
+            "game_id": game_id,
+            "format": format,
+            "results_version": version,
+            "status": "queued",
+            "progress": {"rows": 0, "total": await self._total(game_id)},
+            "cached": False,
+            "created_at": datetime.utcnow(),
+            "heartbeat_at": datetime.utcnow(),
+            "completed_at": None,
+            "error": None
+        }
+        artifact = await self.cached_artifact(game_id, format, version)
+        if artifact is not None:
+            job.update(
+                status="completed",
+                cached=True,
+                artifact_id=artifact["_id"],
+                progress={"rows": job["progress"]["total"], "total": job["progress"]["total"]},
+                completed_at=job["created_at"]
+            )
+        await self.jobs.insert_one(dict(job))
+
+        if job["status"] == "queued":
+            task = asyncio.create_task(self._run(job))
+            self.tasks[job["id"]] = task
+            task.add_done_callback(lambda _: self.tasks.pop(job["id"], None))
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """The job document, first marking it failed if the worker running it is gone"""
+        job = await self.jobs.find_one({"id": job_id}, {"_id": 0})
+        if job is None or job["status"] not in ("queued", "running"):
+            return job
+        cutoff = datetime.utcnow() - STALE_AFTER
+        if job.get("heartbeat_at", job["created_at"]) >= cutoff:
+            return job
+        failed = await self.jobs.find_one_and_update(
+            {"id": job_id, "status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$not": {"$gte": cutoff}}},
+            {"$set": {"status": "failed", "error": "Export was interrupted", "completed_at": datetime.utcnow()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        return failed or await self.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def _total(self, game_id: str) -> int:
+        if game_id == "all":
+            stats = await self.db.game_stats.aggregate([{"$group": {"_id": None, "count": {"$sum": "$count"}}}]).to_list(1)
+            return stats[0]["count"] if stats else 0
+        stats = await self.db.game_stats.find_one({"_id": game_id}, {"count": 1})
+        return stats["count"] if stats else 0
+
+    async def _counted(self, cursor, job_id: str):
+        """Pass results through while recording how many were written"""
+        rows = 0
+        async for result in cursor:
+            yield result
+            rows += 1
+            if rows % PROGRESS_EVERY == 0:
+                await self.jobs.update_one({"id": job_id}, {"$set": {"progress.rows": rows}})
+        await self.jobs.update_one({"id": job_id}, {"$set": {"progress.rows": rows}})
+
+    async def summaries(self, game_id: str) -> list:
+        """Analytics of each exported game, for the report summary pages"""
+        query = {} if game_id == "all" else {"_id": game_id}
+        stats = [doc async for doc in self.db.game_stats.find(query) if doc["count"]]
+        names = {}
+        async for game in self.db.games.find({"id": {"$in": [doc["_id"] for doc in stats]}}, {"_id": 0, "id": 1, "name": 1}):
+            names[game["id"]] = game["name"]
+        summaries = [{"game_id": doc["_id"], "name": names.get(doc["_id"], doc["_id"]), **summarize(doc)} for doc in stats]
+        return sorted(summaries, key=lambda summary: summary["name"])
+
+    async def write(self, game_id: str, format: str, path: str, job_id: Optional[str] = None) -> None:
+        """Write the export file at `path`, recording progress on the job when given"""
+        export_format = FORMATS[format]
+        query = {} if game_id == "all" else {"game_id": game_id}
+        cursor = self.db.results.find(query, EXPORT_PROJECTION, batch_size=1000)
+        if job_id is not None:
+            cursor = self._counted(cursor, job_id)
+        options = {"summaries": await self.summaries(game_id)} if export_format.summaries else {}
+        await export_format.write(cursor, path, f"Game Results Report - {game_id}", **options)
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        await self.jobs.update_one({"id": job_id}, {"$set": {
+            "status": "failed",
+            "error": error,
+            "completed_at": datetime.utcnow()
+        }})
+
+    async def _run(self, job: dict) -> None:
+        try:
+            async with self.slots:
+                await self.jobs.update_one({"id": job["id"]}, {"$set": {"status": "running"}})
+                fd, path = tempfile.mkstemp(prefix="export-", suffix=f".{FORMATS[job['format']].extension}")
+                os.close(fd)
+                try:
+                    await self.write(job["game_id"], job["format"], path, job_id=job["id"])
+                    artifact = await self._store(job, path)
+                    await self.jobs.update_one({"id": job["id"]}, {"$set": {
+                        "status": "completed",
+                        "artifact_id": artifact["_id"],
+                        "completed_at": datetime.utcnow()
+                    }})
+                except Exception as e:
+                    logger.exception(f"Export job {job['id']} failed")
+                    await self._fail(job["id"], str(e))
+                finally:
+                    os.unlink(path)
+        except asyncio.CancelledError:
+            # Shutting down; without this the job would stay queued or running for good
+            await self._fail(job["id"], "Export was interrupted by a server shutdown")
+            raise
+
+    async def _store(self, job: dict, path: str) -> dict:
+        """Keep the file as the artifact for its game, format and version, replacing older ones"""
+        blob_hash = await asyncio.to_thread(_file_hash, path)
+        await self.refs.acquire([blob_hash])
+        await self.store.put_stream(blob_hash, lambda: _file_chunks(path))
+
+        artifact = {
+            "_id": f"{job['game_id']}:{job['format']}:{job['results_version']}",
+            "game_id": job["game_id"],
+            "format": job["format"],
+            "results_version": job["results_version"],
+            "blob_hash": blob_hash,
+            "size": os.path.getsize(path),
+            "content_type": FORMATS[job["format"]].content_type,
+            "filename": artifact_filename(job["game_id"], job["format"]),
+            "created_at": datetime.utcnow()
+        }
+        try:
+            await self.artifacts.insert_one(artifact)
+        except DuplicateKeyError:
+            # A concurrent job stored the same version first; keep that one
+            await self.refs.release([blob_hash])
+            return await self.artifacts.find_one({"_id": artifact["_id"]})
+
+        # Artifacts of other versions will never be served again. A job that finishes after
+        # a newer one may itself be stale, and then must not remove the newer artifact.
+        current = await self.results_version(job["game_id"])
+        if job["results_version"] != current:
+            return artifact
+        async for stale in self.artifacts.find(
+            {"game_id": job["game_id"], "format": job["format"], "results_version": {"$ne": current}}
+        ):
+            removed = await self.artifacts.find_one_and_delete({"_id": stale["_id"]})
+            if removed is not None:
+                await self.refs.release([removed["blob_hash"]])
+        return artifact
+
+    async def run(self, interval: float = HEARTBEAT_INTERVAL) -> None:
+        """Refresh the heartbeat of this worker's unfinished jobs"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.tasks:
+                continue
+            try:
+                await self.jobs.update_many(
+                    {"id": {"$in": list(self.tasks)}},
+                    {"$set": {"heartbeat_at": datetime.utcnow()}}
+                )
+            except Exception:
+                logger.exception("Export job heartbeat failed")
+
+    async def shutdown(self) -> None:
+        """Cancel unfinished jobs; each marks itself failed before it stops"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,281 @@
+"""Result export writers.
+
+Writers consume results straight from a Motor cursor so an export never
+holds more than a small buffer of rows, whatever the number of results.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional, Sequence
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+EXPORT_HEADERS = ["Player Name", "Team Name", "Score", "Risks Found", "Time Spent", "Clicks Used", "Date"]
+
+# Only the fields the exports write are read from the database
+EXPORT_PROJECTION = {
+    "_id": 0,
+    "game_id": 1,
+    "player_name": 1,
+    "team_name": 1,
+    "total_score": 1,
+    "total_risks_found": 1,
+    "total_time_spent": 1,
+    "total_clicks_used": 1,
+    "created_at": 1,
+}
+
+# Rows buffered before a CSV chunk is handed to the response
+CSV_CHUNK_ROWS = 500
+
+
+def export_row(result: dict) -> list:
+    return [
+        result.get("player_name", ""),
+        result.get("team_name", ""),
+        result.get("total_score", 0),
+        result.get("total_risks_found", 0),
+        result.get("total_time_spent", 0),
+        result.get("total_clicks_used", 0),
+        result.get("created_at", ""),
+    ]
+
+
+async def csv_chunks(cursor) -> AsyncIterator[bytes]:
+    """Encode results from an async cursor as CSV, CSV_CHUNK_ROWS rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    rows = 0
+    async for result in cursor:
+        writer.writerow(export_row(result))
+        rows += 1
+        if rows % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def write_csv(cursor, path: str, title: str = "") -> None:
+    with open(path, "wb") as f:
+        async for chunk in csv_chunks(cursor):
+            await asyncio.to_thread(f.write, chunk)
+
+
+# Rows handed to the worker thread at a time when writing a workbook
+EXCEL_BATCH_ROWS = 1000
+
+
+def _excel_row(result: dict) -> list:
+    row = export_row(result)
+    row[-1] = str(row[-1])
+    return row
+
+
+def _append_rows(sheet, rows: list) -> None:
+    for row in rows:
+        sheet.append(row)
+
+
+async def write_excel(cursor, path: str, title: str = "") -> None:
+    """Write results from an async cursor to an .xlsx file at `path`.
+
+    The workbook is write-only, so openpyxl streams rows to disk instead of
+    keeping cell objects; appending and saving run in a worker thread to keep
+    the XML serialization off the event loop.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Game Results")
+    sheet.append(EXPORT_HEADERS)
+
+    batch = []
+    async for result in cursor:
+        batch.append(_excel_row(result))
+        if len(batch) >= EXCEL_BATCH_ROWS:
+            await asyncio.to_thread(_append_rows, sheet, batch)
+            batch = []
+    await asyncio.to_thread(_append_rows, sheet, batch)
+    await asyncio.to_thread(workbook.save, path)
+
+
+PDF_HEADERS = ["Player", "Team", "Score", "Risks", "Time", "Clicks", "Date"]
+PDF_COLUMNS = [50, 130, 190, 240, 290, 340, 390]
+PDF_LEADING = 15
+
+# Reports are drawn in separate processes; reportlab holds the GIL for the whole render
+report_pool = ProcessPoolExecutor(max_workers=int(os.environ.get("REPORT_WORKERS", "1")))
+
+
+def _pdf_row(result: dict) -> tuple:
+    return (
+        result.get("player_name", "")[:15],  # Truncate long names
+        result.get("team_name", "")[:10],
+        str(result.get("total_score", 0)),
+        str(result.get("total_risks_found", 0)),
+        str(result.get("total_time_spent", 0)),
+        str(result.get("total_clicks_used", 0)),
+        str(result.get("created_at", ""))[:10],  # Date only
+    )
+
+
+def _draw_summary(doc, summary: dict, height: float) -> None:
+    doc.setFont("Helvetica-Bold", 16)
+    doc.drawString(50, height - 50, f"Summary - {summary['name']}")
+    doc.setFont("Helvetica", 11)
+    doc.drawString(50, height - 80, f"Players: {summary['total_players']}")
+
+    doc.setFont("Helvetica-Bold", 10)
+    y_position = height - 120
+    for x, header in zip(PDF_COLUMNS, ["", "Mean", "Std dev", "Min", "Max"]):
+        doc.drawString(x, y_position, header)
+    doc.setFont("Helvetica", 10)
+    for label, key in (("Score", "score"), ("Time", "time"), ("Clicks", "clicks"), ("Risks found", "risks")):
+        y_position -= 20
+        measure = summary[key]
+        values = [label, measure["mean"], measure["stddev"], measure["min"], measure["max"]]
+        for x, value in zip(PDF_COLUMNS, values):
+            doc.drawString(x, y_position, str(value))
+    doc.showPage()
+
+
+def _draw_rows(doc, rows: list, top: float) -> None:
+    """One text object per column instead of one drawString call per cell"""
+    for column, x in enumerate(PDF_COLUMNS):
+        text = doc.beginText(x, top)
+        text.setFont("Helvetica", 9)
+        text.setLeading(PDF_LEADING)
+        for row in rows:
+            text.textLine(row[column])
+        doc.drawText(text)
+
+
+def render_pdf(rows: list, path: str, title: str, summaries: Sequence[dict] = ()) -> None:
+    """Draw a summary page per game, then the results table across as many pages as needed.
+
+    Takes plain tuples of display strings so it can run in report_pool.
+    """
+    doc = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    for summary in summaries:
+        _draw_summary(doc, summary, height)
+
+    doc.setFont("Helvetica-Bold", 16)
+    doc.drawString(50, height - 50, title)
+    doc.setFont("Helvetica-Bold", 10)
+    for x, header in zip(PDF_COLUMNS, PDF_HEADERS):
+        doc.drawString(x, height - 100, header)
+
+    # The first page starts below the title and headers, the others at the top
+    top = height - 120
+    while True:
+        per_page = int((top - 50) // PDF_LEADING) + 1
+        _draw_rows(doc, rows[:per_page], top)
+        rows = rows[per_page:]
+        if not rows:
+            break
+        doc.showPage()
+        top = height - 50
+
+    doc.save()
+
+
+async def write_pdf(cursor, path: str, title: str = "", summaries: Sequence[dict] = ()) -> None:
+    # Only the short display strings cross to the worker process
+    rows = [_pdf_row(result) async for result in cursor]
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(report_pool, render_pdf, rows, path, title, list(summaries))
+
+
+# Typed columns for the data exports, named after the result fields
+RESULT_SCHEMA = pa.schema([
+    ("game_id", pa.string()),
+    ("player_name", pa.string()),
+    ("team_name", pa.string()),
+    ("total_score", pa.int64()),
+    ("total_risks_found", pa.int64()),
+    ("total_time_spent", pa.int64()),
+    ("total_clicks_used", pa.int64()),
+    ("created_at", pa.timestamp("ms", tz="UTC")),
+])
+PARQUET_ROW_GROUP_ROWS = 50000
+
+
+def _record(result: dict) -> dict:
+    return {field.name: result.get(field.name) for field in RESULT_SCHEMA}
+
+
+def _write_row_group(writer, records: list) -> None:
+    writer.write_table(pa.Table.from_pylist(records, schema=RESULT_SCHEMA))
+
+
+async def write_parquet(cursor, path: str, title: str = "") -> None:
+    """Write results to a Parquet file, one row group per PARQUET_ROW_GROUP_ROWS results"""
+    writer = pq.ParquetWriter(path, RESULT_SCHEMA, compression="zstd")
+    try:
+        batch = []
+        async for result in cursor:
+            batch.append(_record(result))
+            if len(batch) >= PARQUET_ROW_GROUP_ROWS:
+                await asyncio.to_thread(_write_row_group, writer, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(_write_row_group, writer, batch)
+    finally:
+        await asyncio.to_thread(writer.close)
+
+
+# Lines buffered before an NDJSON chunk is handed to the response
+NDJSON_CHUNK_LINES = 1000
+
+
+def _json_line(result: dict) -> str:
+    record = _record(result)
+    if record["created_at"] is not None:
+        # Mongo datetimes are naive UTC
+        record["created_at"] = record["created_at"].isoformat() + "Z"
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+async def ndjson_chunks(cursor) -> AsyncIterator[bytes]:
+    """Encode results from an async cursor as one JSON object per line"""
+    lines = []
+    async for result in cursor:
+        lines.append(_json_line(result))
+        if len(lines) >= NDJSON_CHUNK_LINES:
+            yield "".join(lines).encode()
+            lines = []
+    yield "".join(lines).encode()
+
+
+async def write_ndjson(cursor, path: str, title: str = "") -> None:
+    with open(path, "wb") as f:
+        async for chunk in ndjson_chunks(cursor):
+            await asyncio.to_thread(f.write, chunk)
+
+
+class ExportFormat(NamedTuple):
+    content_type: str
+    extension: str
+    # async (cursor, path, title) -> None, writing the whole file at path
+    write: Callable[..., Awaitable[None]]
+    # The writer also takes summaries=[per-game analytics] for its summary pages
+    summaries: bool = False
+    # Optional (cursor) -> async iterator of bytes, for formats streamed without a file
+    stream: Optional[Callable[..., AsyncIterator[bytes]]] = None
+
+
+FORMATS = {
+    "csv": ExportFormat("text/csv", "csv", write_csv, stream=csv_chunks),
+    "excel": ExportFormat("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx", write_excel),
+    "pdf": ExportFormat("application/pdf", "pdf", write_pdf, summaries=True),
+    "parquet": ExportFormat("application/vnd.apache.parquet", "parquet", write_parquet),
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", write_ndjson, stream=ndjson_chunks),
+}
@@ -0,0 +1,127 @@
+"""Per-game result statistics maintained incrementally.
+
+Each game has one document in `game_stats`, keyed by game id, holding the
+number of results and, for every measured field, its sum, sum of squares,
+minimum and maximum. Recording a result is a single upsert with $inc/$min/$max,
+and the dashboard reads one document instead of scanning `results`.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+# stats key -> GameResult field
+MEASURES = {
+    "score": "total_score",
+    "time": "total_time_spent",
+    "clicks": "total_clicks_used",
+    "risks": "total_risks_found",
+}
+
+
+def stats_updates(results: Iterable[dict]) -> List[UpdateOne]:
+    """One upsert per game folding the given result documents into its statistics"""
+    by_game = defaultdict(list)
+    for result in results:
+        by_game[result["game_id"]].append(result)
+
+    updates = []
+    for game_id, game_results in by_game.items():
+        inc = {"count": len(game_results)}
+        minimum, maximum = {}, {}
+        for key, field in MEASURES.items():
+            values = [result.get(field, 0) for result in game_results]
+            inc[f"{key}.sum"] = sum(values)
+            inc[f"{key}.sumsq"] = sum(value * value for value in values)
+            minimum[f"{key}.min"] = min(values)
+            maximum[f"{key}.max"] = max(values)
+        updates.append(UpdateOne(
+            {"_id": game_id},
+            {"$inc": inc, "$min": minimum, "$max": maximum, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        ))
+    return updates
+
+
+def rebuild_pipeline(game_id: Optional[str] = None) -> list:
+    """Aggregation recomputing statistics from `results` into `game_stats`.
+
+    Without a game id every game is recomputed and the collection replaced.
+    With one, that game's document is only inserted if it is still missing:
+    a result recorded while the aggregation ran may have created it with $inc,
+    and replacing it would lose that result for good.
+    """
+    group = {"_id": "$game_id", "count": {"$sum": 1}}
+    project = {"count": 1, "updated_at": "$$NOW"}
+    for key, field in MEASURES.items():
+        group[f"{key}_sum"] = {"$sum": f"${field}"}
+        group[f"{key}_sumsq"] = {"$sum": {"$multiply": [f"${field}", f"${field}"]}}
+        group[f"{key}_min"] = {"$min": f"${field}"}
+        group[f"{key}_max"] = {"$max": f"${field}"}
+        project[key] = {
+            "sum": f"${key}_sum",
+            "sumsq": f"${key}_sumsq",
+            "min": f"${key}_min",
+            "max": f"${key}_max",
+        }
+    if game_id is None:
+        return [{"$group": group}, {"$project": project}, {"$out": "game_stats"}]
+    return [
+        {"$match": {"game_id": game_id}},
+        {"$group": group},
+        {"$project": project},
+        {"$merge": {"into": "game_stats", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ]
+
+
+async def load_game_stats(db, game_id: str) -> Optional[dict]:
+    """A game's statistics document, computed from `results` first if it has none yet.
+
+    Results saved before game_stats existed are never folded in incrementally,
+    so a missing document with results behind it is built here on first read.
+    """
+    stats = await db.game_stats.find_one({"_id": game_id})
+    if stats is None and await db.results.find_one({"game_id": game_id}, {"_id": 1}):
+        await db.results.aggregate(rebuild_pipeline(game_id)).to_list(None)
+        stats = await db.game_stats.find_one({"_id": game_id})
+    return stats
+
+
+async def backfill_game_stats(db) -> bool:
+    """Build game_stats from `results` when it is empty but results exist; True if it ran"""
+    if await db.game_stats.find_one({}, {"_id": 1}) or not await db.results.find_one({}, {"_id": 1}):
+        return False
+    await db.results.aggregate(rebuild_pipeline()).to_list(None)
+    return True
+
+
+def _describe(measure: dict, count: int) -> dict:
+    mean = measure["sum"] / count
+    # Population variance from the running sums; clamp rounding noise below zero
+    variance = max(measure["sumsq"] / count - mean * mean, 0.0)
+    return {
+        "mean": round(mean, 2),
+        "stddev": round(math.sqrt(variance), 2),
+        "min": measure["min"],
+        "max": measure["max"],
+    }
+
+
+def summarize(stats: dict) -> dict:
+    """Analytics response fields for one game_stats document"""
+    count = stats["count"]
+    score = _describe(stats["score"], count)
+    time_spent = _describe(stats["time"], count)
+    return {
+        "total_players": count,
+        "average_score": score["mean"],
+        "average_time": time_spent["mean"],
+        "total_clicks": stats["clicks"]["sum"],
+        "total_risks_found": stats["risks"]["sum"],
+        "score": score,
+        "time": time_spent,
+        "clicks": _describe(stats["clicks"], count),
+        "risks": _describe(stats["risks"], count),
+    }
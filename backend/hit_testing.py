@@ -0,0 +1,204 @@
+"""Compiled hit-testing for risk zones.
+
+Each image's zones are compiled once into a uniform grid of bounding boxes.
+A click only runs exact shape tests against the zones whose boxes cover
+its grid cell, instead of looping over every zone. Large polygons keep
+their vertices as NumPy arrays so the point-in-polygon test is vectorized.
+"""
+import heapq
+import math
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Zones spanning more cells than this (long thin ones) are checked on every click instead
+MAX_CELLS_PER_ZONE = 1024
+
+
+def _circle_valid(coordinates):
+    return len(coordinates) == 3
+
+
+def _circle_bounds(coordinates):
+    cx, cy, radius = coordinates
+    return cx - radius, cy - radius, cx + radius, cy + radius
+
+
+def _circle_contains(coordinates, x, y):
+    cx, cy, radius = coordinates
+    return (x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2
+
+
+def _rectangle_valid(coordinates):
+    return len(coordinates) == 4
+
+
+def _rectangle_bounds(coordinates):
+    x, y, width, height = coordinates
+    return x, y, x + width, y + height
+
+
+def _rectangle_contains(coordinates, x, y):
+    rx, ry, width, height = coordinates
+    return rx <= x <= rx + width and ry <= y <= ry + height
+
+
+def _polygon_valid(coordinates):
+    # Flat [x1, y1, x2, y2, ...] with at least three vertices
+    return len(coordinates) >= 6 and len(coordinates) % 2 == 0
+
+
+def _polygon_bounds(coordinates):
+    xs, ys = coordinates[0::2], coordinates[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# Below this many vertices the per-call NumPy overhead outweighs the vectorized loop
+NUMPY_MIN_VERTICES = 64
+
+
+def polygon_arrays(coordinates):
+    """Split the vertices into arrays of edge start and end points"""
+    vertices = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    xs, ys = vertices[:, 0], vertices[:, 1]
+    return xs, ys, np.roll(xs, -1), np.roll(ys, -1)
+
+
+def point_in_polygon(polygon, x, y):
+    """Even-odd rule over all edges of polygon_arrays() at once"""
+    xs, ys, xs_next, ys_next = polygon
+    # Edges that straddle the horizontal line through the point
+    crosses = (ys > y) != (ys_next > y)
+    # Horizontal edges never cross, so their division result is masked out
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at_y = xs + (y - ys) * (xs_next - xs) / (ys_next - ys)
+    return bool(np.count_nonzero(crosses & (x < x_at_y)) & 1)
+
+
+def point_in_polygon_python(coordinates, x, y):
+    """Even-odd rule one edge at a time, for flat [x1, y1, x2, y2, ...] lists"""
+    inside = False
+    count = len(coordinates)
+    for i in range(0, count, 2):
+        x1, y1 = coordinates[i], coordinates[i + 1]
+        x2, y2 = coordinates[(i + 2) % count], coordinates[(i + 3) % count]
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _polygon_prepare(coordinates):
+    if len(coordinates) // 2 < NUMPY_MIN_VERTICES:
+        return False, list(coordinates)
+    return True, polygon_arrays(coordinates)
+
+
+def _polygon_contains(polygon, x, y):
+    vectorized, data = polygon
+    if vectorized:
+        return point_in_polygon(data, x, y)
+    return point_in_polygon_python(data, x, y)
+
+
+def _unchanged(coordinates):
+    return coordinates
+
+
+# zone type -> (coordinate check, bounding box, compiled form, exact containment test)
+SHAPES = {
+    "circle": (_circle_valid, _circle_bounds, _unchanged, _circle_contains),
+    "rectangle": (_rectangle_valid, _rectangle_bounds, _unchanged, _rectangle_contains),
+    "polygon": (_polygon_valid, _polygon_bounds, _polygon_prepare, _polygon_contains),
+}
+
+
+class CompiledZones:
+    """Grid index over one image's risk zones.
+
+    Zones keep their list order: when several overlap, the first one in the
+    list wins, as in the original linear scan. Zones that would fill more than
+    MAX_CELLS_PER_ZONE cells are kept in `oversized` and tested on every hit.
+    """
+
+    def __init__(self, zones: List[Dict[str, Any]]):
+        self.zones = []
+        self.tests = []
+        bounds = []
+        for zone in zones:
+            shape = SHAPES.get(zone.get("type"))
+            coordinates = zone.get("coordinates") or []
+            if shape is None:
+                continue
+            valid, shape_bounds, prepare, contains = shape
+            if not valid(coordinates):
+                continue
+            self.zones.append(zone)
+            self.tests.append((contains, prepare(coordinates)))
+            bounds.append(shape_bounds(coordinates))
+
+        self.cells: Dict[tuple, List[int]] = {}
+        self.oversized: List[int] = []
+        if not bounds:
+            self.cell_size = 1.0
+            return
+
+        # Roughly one zone per cell across the area the zones cover
+        min_x = min(b[0] for b in bounds)
+        min_y = min(b[1] for b in bounds)
+        max_x = max(b[2] for b in bounds)
+        max_y = max(b[3] for b in bounds)
+        area = max((max_x - min_x) * (max_y - min_y), 1.0)
+        self.cell_size = max(math.sqrt(area / len(bounds)), 1.0)
+
+        for index, (x0, y0, x1, y1) in enumerate(bounds):
+            columns = range(self._cell(x0), self._cell(x1) + 1)
+            rows = range(self._cell(y0), self._cell(y1) + 1)
+            if len(columns) * len(rows) > MAX_CELLS_PER_ZONE:
+                self.oversized.append(index)
+                continue
+            for cx in columns:
+                for cy in rows:
+                    self.cells.setdefault((cx, cy), []).append(index)
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def hit(self, x: float, y: float) -> Optional[Dict[str, Any]]:
+        """Return the first zone containing (x, y), or None"""
+        candidates = self.cells.get((self._cell(x), self._cell(y)), ())
+        if self.oversized:
+            # Both lists are in zone order, so the merge keeps the first match first
+            candidates = heapq.merge(candidates, self.oversized)
+        for index in candidates:
+            contains, coordinates = self.tests[index]
+            if contains(coordinates, x, y):
+                return self.zones[index]
+        return None
+
+
+class ZoneIndexCache:
+    """LRU of compiled zones keyed by image id, valid for one `updated_at`"""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, image_id: str, updated_at) -> Optional[CompiledZones]:
+        entry = self.entries.get(image_id)
+        if entry is None or entry[0] != updated_at:
+            return None
+        self.entries.move_to_end(image_id)
+        return entry[1]
+
+    def put(self, image_id: str, updated_at, zones: CompiledZones) -> None:
+        self.entries[image_id] = (updated_at, zones)
+        self.entries.move_to_end(image_id)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def discard(self, image_id: str) -> None:
+        self.entries.pop(image_id, None)
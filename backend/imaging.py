@@ -0,0 +1,62 @@
+"""Pillow helpers that run inside the image process pool.
+
+Everything here must stay picklable (plain top-level functions taking and
+returning bytes and builtins) because it is executed in worker processes.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+# Longest-edge bounds for each derivative. The play size matches the game
+# canvas (max-w-4xl, max-h 600px in the frontend) with headroom for HiDPI.
+DERIVATIVE_SIZES = {
+    "thumbnail": (320, 320),
+    "play": (1600, 1200),
+}
+JPEG_QUALITY = 85
+
+
+def _encode(img: Image.Image):
+    """Encode a derivative, keeping transparency only when the source has it"""
+    output = io.BytesIO()
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img.save(output, format="PNG", optimize=True)
+        content_type = "image/png"
+    else:
+        img.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        content_type = "image/jpeg"
+    return output.getvalue(), content_type
+
+
+def build_derivatives(source, fallback_content_type: str = "image/jpeg") -> dict:
+    """Describe the original and render the smaller derivatives.
+
+    `source` is either the image bytes or the path of a file holding them.
+
+    Returns {"original": {...}, "thumbnail": {...}, "play": {...}} where the
+    original entry holds content_type/width/height and each derivative also
+    carries its encoded bytes under "data". A derivative is omitted when the
+    original already fits its bounds, or when Pillow cannot read the upload.
+    """
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            content_type = Image.MIME.get(img.format, fallback_content_type)
+            img = ImageOps.exif_transpose(img)
+            width, height = img.size
+            derivatives = {"original": {"content_type": content_type, "width": width, "height": height}}
+
+            for name, bounds in DERIVATIVE_SIZES.items():
+                if width <= bounds[0] and height <= bounds[1]:
+                    continue
+                resized = img.copy()
+                resized.thumbnail(bounds, Image.LANCZOS)
+                encoded, derivative_type = _encode(resized)
+                derivatives[name] = {
+                    "data": encoded,
+                    "content_type": derivative_type,
+                    "width": resized.width,
+                    "height": resized.height
+                }
+            return derivatives
+    except Exception:
+        return {"original": {"content_type": fallback_content_type, "width": 0, "height": 0}}
@@ -0,0 +1,106 @@
+"""Index provisioning for every collection the API queries.
+
+ensure_indexes() runs at startup and creates any missing index (creating an
+existing one is a no-op). verify_indexes() then explains each hot query and
+reports the ones MongoDB would still answer with a collection scan.
+"""
+import logging
+import os
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_INDEXES = {
+    "images": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Keyset pagination of the image library
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "games": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("public_link", ASCENDING), ("is_public", ASCENDING)]),
+        # Shortest time limit, read by the session sweeper
+        IndexModel([("time_limit", ASCENDING)]),
+    ],
+    "sessions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Expired active sessions, oldest first, for the sweeper
+        IndexModel([("status", ASCENDING), ("started_at", ASCENDING)]),
+    ],
+    "results": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # A game's results newest first, keyset-paginated on (created_at, id)
+        IndexModel([("game_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("session_id", ASCENDING)]),
+    ],
+    "export_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Finished jobs are only polled briefly; drop them after a day
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=24 * 60 * 60),
+    ],
+    "export_artifacts": [
+        IndexModel([("game_id", ASCENDING), ("format", ASCENDING)]),
+    ],
+    # Polled by every worker for changes since its last poll
+    "cache_versions": [
+        IndexModel([("changed_at", ASCENDING)]),
+    ],
+}
+
+# (collection, filter, sort) for the queries on the request path
+HOT_QUERIES = [
+    ("images", {"id": ""}, None),
+    ("images", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("games", {"id": ""}, None),
+    ("games", {"public_link": "", "is_public": True}, None),
+    ("sessions", {"id": ""}, None),
+    ("sessions", {"status": "active", "started_at": {"$lte": datetime.min}}, [("started_at", ASCENDING)]),
+    ("sessions", {"id": {"$in": [""]}, "sweep_id": ""}, None),
+    ("results", {"game_id": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("results", {"session_id": ""}, None),
+]
+
+
+async def ensure_indexes(db) -> None:
+    for collection, indexes in REQUIRED_INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+def _stages(plan: dict):
+    """Every stage name in an explain() plan tree"""
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def verify_indexes(db, mode: str = None) -> list:
+    """Explain every hot query and report the ones planned as collection scans.
+
+    `mode` (default: the INDEX_CHECK environment variable) is "warn" to log
+    them, "strict" to raise RuntimeError, or "off". Returns the offending
+    queries.
+    """
+    mode = mode or os.environ.get("INDEX_CHECK", "warn")
+    if mode == "off":
+        return []
+
+    scans = []
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _stages(plan):
+            scans.append(f"{collection} {query}")
+
+    if scans:
+        message = "Queries planned as collection scans: " + "; ".join(scans)
+        if mode == "strict":
+            raise RuntimeError(message)
+        logger.warning(message)
+    return scans
@@ -0,0 +1,25 @@
+"""JSON responses encoded with orjson.
+
+Read endpoints query with {"_id": 0} and return a FastJSONResponse directly.
+FastAPI passes a returned Response through untouched, so the documents are
+encoded once by orjson instead of being walked by serialize_doc and then
+again by jsonable_encoder.
+"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not know; only called for values it cannot encode itself"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        # Naive datetimes keep the isoformat() output jsonable_encoder produced
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
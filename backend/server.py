@@ -1,7 +1,8 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse, Response, RedirectResponse
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
@@ -9,47 +10,59 @@ from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime
+import hashlib
+import tempfile
+import math
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 import json
 import base64
-from bson import ObjectId
-import csv
-import io
-import openpyxl
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+from blob_store import create_blob_store, content_hash, BlobNotFound, BlobRefCounter
+from imaging import build_derivatives
+from hit_testing import CompiledZones, ZoneIndexCache
+from cache import TTLCache, ReadThroughCache, VersionTable, create_backend
+from session_manager import SessionStateManager, lease_available
+from indexes import ensure_indexes, verify_indexes
+from game_stats import stats_updates, rebuild_pipeline, summarize, load_game_stats, backfill_game_stats
+from exports import EXPORT_PROJECTION, FORMATS, report_pool
+from export_jobs import ExportJobs, artifact_filename
+from responses import FastJSONResponse
+from pymongo import ReturnDocument
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Helper function to convert ObjectId to string
-def serialize_doc(doc):
-    """Convert MongoDB document to JSON serializable format"""
-    if doc is None:
-        return None
-    if isinstance(doc, list):
-        return [serialize_doc(item) for item in doc]
-    if isinstance(doc, dict):
-        result = {}
-        for key, value in doc.items():
-            if key == '_id':
-                continue  # Skip MongoDB _id field
-            elif isinstance(value, ObjectId):
-                result[key] = str(value)
-            elif isinstance(value, list):
-                result[key] = [serialize_doc(item) for item in value]
-            elif isinstance(value, dict):
-                result[key] = serialize_doc(value)
-            else:
-                result[key] = value
-        return result
-    return doc
+# Keyset pagination cursors are opaque base64 strings of (created_at, id)
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    payload = json.dumps([created_at.isoformat(), doc_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(cursor: Optional[str], descending: bool = False) -> dict:
+    """Match documents strictly after the cursor in (created_at, id) order, or before it when descending"""
+    if not cursor:
+        return {}
+    created_at, doc_id = decode_cursor(cursor)
+    after = "$lt" if descending else "$gt"
+    return {"$or": [
+        {"created_at": {after: created_at}},
+        {"created_at": created_at, "id": {after: doc_id}}
+    ]}
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
+blob_store = create_blob_store(db)
+blob_refs = BlobRefCounter(db.blob_refs, blob_store)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -71,7 +84,13 @@ class RiskZone(BaseModel):
 class GameImage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
-    image_data: str  # base64 encoded image
+    blob_hash: str = ""  # SHA-256 key of the image bytes in the blob store
+    content_type: str = "image/jpeg"
+    size: int = 0
+    width: int = 0
+    height: int = 0
+    source_url: str = ""  # External images (sample data) that are not stored locally
+    derivatives: Dict[str, Dict[str, Any]] = {}  # "thumbnail"/"play" -> blob_hash, content_type, size, width, height
     risk_zones: List[RiskZone] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -119,6 +138,194 @@ class GameResult(BaseModel):
     image_results: List[Dict[str, Any]] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Image storage helpers
+# Pillow work (decoding, resizing, encoding) runs here so the event loop is never blocked
+image_pool = ProcessPoolExecutor(max_workers=int(os.environ.get("IMAGE_WORKERS", "2")))
+
+# Uploads are copied to disk in fixed-size chunks so memory use does not grow with the file
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def spool_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE):
+    """Copy an upload to a temporary file chunk by chunk while hashing it.
+    
+    Returns (path, blob_hash, size); the caller removes the file. Raises 413
+    as soon as the upload grows past max_size.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"Image exceeds the {max_size} byte upload limit")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), size
+
+async def read_file_chunks(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+
+async def render_derivatives(source, fallback_content_type: str) -> Dict[str, Any]:
+    """Render derivatives in the process pool, store them and return the image document metadata"""
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(image_pool, build_derivatives, source, fallback_content_type)
+    
+    original = rendered.pop("original")
+    metadata = {
+        "content_type": original["content_type"],
+        "width": original["width"],
+        "height": original["height"],
+        "derivatives": {}
+    }
+    for name, derivative in rendered.items():
+        derivative_data = derivative.pop("data")
+        derivative_hash = content_hash(derivative_data)
+        await blob_refs.acquire([derivative_hash])
+        metadata["derivatives"][name] = {
+            "blob_hash": await blob_store.put(derivative_data),
+            "size": len(derivative_data),
+            **derivative
+        }
+    return metadata
+
+async def store_image_file(path: str, blob_hash: str, size: int, fallback_content_type: str = "image/jpeg") -> Dict[str, Any]:
+    """Save a spooled upload and its derivatives to the blob store"""
+    # The worker reads the file from disk, so the bytes never pass through this process at once
+    metadata = await render_derivatives(path, fallback_content_type)
+    await blob_refs.acquire([blob_hash])
+    await blob_store.put_stream(blob_hash, lambda: read_file_chunks(path))
+    return {"blob_hash": blob_hash, "size": size, **metadata}
+
+async def store_image_bytes(data: bytes, fallback_content_type: str = "image/jpeg") -> Dict[str, Any]:
+    """Save in-memory image bytes and their derivatives to the blob store"""
+    metadata = await render_derivatives(data, fallback_content_type)
+    await blob_refs.acquire([content_hash(data)])
+    return {"blob_hash": await blob_store.put(data), "size": len(data), **metadata}
+
+async def migrate_image(image_id: str, image_data: str) -> None:
+    """Move one legacy image's inline base64 (or URL placeholder) out of its document"""
+    if image_data.startswith("http"):
+        update = {"source_url": image_data}
+    else:
+        update = await store_image_bytes(base64.b64decode(image_data))
+    result = await db.images.update_one(
+        {"id": image_id, "image_data": {"$exists": True}},
+        {"$set": update, "$unset": {"image_data": ""}}
+    )
+    if result.modified_count == 0:
+        # Migrated concurrently; drop the references taken for this copy
+        await blob_refs.release(image_blob_hashes(update))
+
+async def migrated_image(image: dict) -> dict:
+    """The image document (without image_data), migrating it first if it is a legacy one"""
+    if image.get("blob_hash") or image.get("source_url"):
+        return image
+    legacy = await db.images.find_one({"id": image["id"]}, {"_id": 0, "image_data": 1})
+    if not legacy or not legacy.get("image_data"):
+        return image
+    await migrate_image(image["id"], legacy["image_data"])
+    return await db.images.find_one({"id": image["id"]}, {"image_data": 0}) or image
+
+def image_blob_hashes(image: dict) -> set:
+    """All blobs an image document points at: the original and every derivative"""
+    hashes = {derivative["blob_hash"] for derivative in image.get("derivatives", {}).values()}
+    if image.get("blob_hash"):
+        hashes.add(image["blob_hash"])
+    return hashes
+
+def image_url(image: dict, size: str = "original") -> str:
+    """URL of the image pixels at the given size, falling back to the original when no derivative exists"""
+    if image.get("source_url"):
+        return image["source_url"]
+    url = f"/api/images/{image['id']}/raw"
+    if size in image.get("derivatives", {}):
+        url += f"?size={size}"
+    return url
+
+# Compiled risk zones for click scoring, rebuilt whenever an image's updated_at changes
+zone_index_cache = ZoneIndexCache(maxsize=int(os.environ.get("ZONE_CACHE_SIZE", "512")))
+
+# Game configs and zone definitions change rarely, so reads go through in-process caches.
+# Entries are dropped by the write endpoints and expire after the TTL as a safety net.
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "60"))
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", "1024"))
+
+async def load_game(game_id: str) -> Optional[dict]:
+    return await db.games.find_one({"id": game_id}, {"_id": 0})
+
+async def load_public_game(public_link: str) -> Optional[dict]:
+    return await db.games.find_one({"public_link": public_link, "is_public": True}, {"_id": 0})
+
+async def load_image_zones(image_id: str) -> Optional[dict]:
+    return await db.images.find_one({"id": image_id}, {"_id": 0, "risk_zones": 1, "updated_at": 1})
+
+game_cache = ReadThroughCache("games", load_game, create_backend(CACHE_SIZE, CACHE_TTL))
+public_game_cache = ReadThroughCache("public_games", load_public_game, create_backend(CACHE_SIZE, CACHE_TTL))
+image_zone_cache = ReadThroughCache("image_zones", load_image_zones, create_backend(CACHE_SIZE, CACHE_TTL))
+caches = [game_cache, public_game_cache, image_zone_cache]
+
+# Only update_session can move a session to another game, and it invalidates the mapping
+session_game_ids = TTLCache(maxsize=100000)
+
+async def get_cached_game(game_id: str) -> Optional[dict]:
+    return await game_cache.get(game_id)
+
+async def get_compiled_zones(image_id: str) -> CompiledZones:
+    """Return the hit-test index for an image without loading its payload"""
+    image = await image_zone_cache.get(image_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    zones = zone_index_cache.get(image_id, image.get("updated_at"))
+    if zones is None:
+        zones = CompiledZones(image.get("risk_zones", []))
+        zone_index_cache.put(image_id, image.get("updated_at"), zones)
+    return zones
+
+def drop_cached_game(game_id: str):
+    game_cache.invalidate(game_id)
+    # Public links can be renamed, so drop every cached public game
+    public_game_cache.clear()
+
+def drop_cached_image(image_id: str):
+    image_zone_cache.invalidate(image_id)
+    zone_index_cache.discard(image_id)
+
+def drop_cached_key(key: str):
+    """Apply an invalidation published by another worker"""
+    kind, _, item_id = key.partition(":")
+    if kind == "game":
+        drop_cached_game(item_id)
+    elif kind == "image":
+        drop_cached_image(item_id)
+    elif kind == "session":
+        session_game_ids.delete(item_id)
+
+# Every worker keeps its own caches; writes are published through this collection
+# and the other workers drop their copies within CACHE_SYNC_INTERVAL seconds
+CACHE_SYNC_INTERVAL = float(os.environ.get("CACHE_SYNC_INTERVAL", "1"))
+cache_versions = VersionTable(db.cache_versions, drop_cached_key)
+
+# Invalidation hooks called by every endpoint that writes games or images
+async def invalidate_game(game_id: str):
+    drop_cached_game(game_id)
+    await cache_versions.bump(f"game:{game_id}")
+
+async def invalidate_image(image_id: str):
+    drop_cached_image(image_id)
+    await cache_versions.bump(f"image:{image_id}")
+
 # Image Management Routes
 @api_router.post("/images/upload")
 async def upload_image(
@@ -126,48 +333,196 @@ async def upload_image(
     file: UploadFile = File(...)
 ):
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Convert to base64
-        image_base64 = base64.b64encode(file_content).decode('utf-8')
+        # Stream the upload to disk, hashing it on the way
+        path, blob_hash, size = await spool_upload(file)
+        try:
+            # Store the bytes by content hash, keep only metadata in the document
+            blob_meta = await store_image_file(path, blob_hash, size, file.content_type or "image/jpeg")
+        finally:
+            os.unlink(path)
         
         # Create image record
-        image_doc = GameImage(
-            name=name,
-            image_data=image_base64
-        )
+        image_doc = GameImage(name=name, **blob_meta)
         
         # Save to database
         await db.images.insert_one(image_doc.dict())
         
         return {"id": image_doc.id, "name": image_doc.name, "message": "Image uploaded successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
+IMAGE_PAGE_SIZE = 50
+IMAGE_PAGE_SIZE_MAX = 200
+
 @api_router.get("/images")
-async def get_images():
+async def get_images(limit: int = IMAGE_PAGE_SIZE, cursor: Optional[str] = None):
     try:
-        images = await db.images.find().to_list(100)
-        return serialize_doc(images)
+        limit = max(1, min(limit, IMAGE_PAGE_SIZE_MAX))
+        
+        # Metadata only: the image bytes and zone definitions stay in the database
+        pipeline = [
+            {"$match": keyset_filter(cursor)},
+            {"$sort": {"created_at": 1, "id": 1}},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,
+                "id": 1,
+                "name": 1,
+                "content_type": 1,
+                "size": 1,
+                "width": 1,
+                "height": 1,
+                "source_url": 1,
+                "derivatives": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "risk_zone_count": {"$size": {"$ifNull": ["$risk_zones", []]}}
+            }}
+        ]
+        images = await db.images.aggregate(pipeline).to_list(limit)
+        
+        for image in images:
+            image["image_url"] = image_url(image, "play")
+            image["thumbnail_url"] = image_url(image, "thumbnail")
+            del image["derivatives"]
+        
+        next_cursor = None
+        if len(images) == limit:
+            next_cursor = encode_cursor(images[-1]["created_at"], images[-1]["id"])
+        
+        return FastJSONResponse({"items": images, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching images: {str(e)}")
 
 @api_router.get("/images/{image_id}")
 async def get_image(image_id: str):
     try:
-        image = await db.images.find_one({"id": image_id})
+        image = await db.images.find_one({"id": image_id}, {"_id": 0, "image_data": 0})
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
-        return serialize_doc(image)
+        # The play size fits the game canvas; the original stays available for downloads
+        image["image_url"] = image_url(image, "play")
+        image["original_url"] = image_url(image)
+        return FastJSONResponse(image)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching image: {str(e)}")
 
+# Image bytes never change for a given image id, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def parse_range_header(range_header: str, size: int):
+    """Parse a single `bytes=` range into (start, end_exclusive).
+    
+    Returns None when the header should be ignored (multiple ranges or another unit)
+    and raises a 416 HTTPException when the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size
+    except ValueError:
+        return None
+    end = min(end, size)
+    if start >= size or start >= end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+@api_router.get("/images/{image_id}/raw")
+async def get_image_raw(image_id: str, request: Request, size: str = "original"):
+    try:
+        image = await db.images.find_one(
+            {"id": image_id},
+            {"_id": 0, "blob_hash": 1, "content_type": 1, "source_url": 1, "image_data": 1, "derivatives": 1}
+        )
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        if image.get("source_url"):
+            return RedirectResponse(image["source_url"])
+        content_type = image.get("content_type", "image/jpeg")
+        if not image.get("blob_hash"):
+            # Legacy document that has not been migrated yet
+            image_data = image.get("image_data") or ""
+            if image_data.startswith("http"):
+                # The sample images stored a URL rather than base64
+                return RedirectResponse(image_data)
+            return Response(
+                content=base64.b64decode(image_data),
+                media_type=content_type,
+                headers={"Cache-Control": "no-cache"}
+            )
+        
+        blob_hash = image["blob_hash"]
+        derivative = image.get("derivatives", {}).get(size)
+        if derivative:
+            blob_hash = derivative["blob_hash"]
+            content_type = derivative["content_type"]
+        etag = f'"{blob_hash}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "Accept-Ranges": "bytes"
+        }
+        
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        
+        length = await blob_store.stat(blob_hash)
+        byte_range = None
+        range_header = request.headers.get("range")
+        # If-Range with a stale validator means the client wants the full body
+        if range_header and request.headers.get("if-range", etag) == etag:
+            byte_range = parse_range_header(range_header, length)
+        
+        if byte_range is None:
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(blob_store.stream(blob_hash), media_type=content_type, headers=headers)
+        
+        start, end = byte_range
+        headers["Content-Length"] = str(end - start)
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{length}"
+        return StreamingResponse(
+            blob_store.stream(blob_hash, start, end),
+            status_code=206,
+            media_type=content_type,
+            headers=headers
+        )
+    except HTTPException:
+        raise
+    except BlobNotFound:
+        raise HTTPException(status_code=404, detail="Image data not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching image data: {str(e)}")
+
 @api_router.put("/images/{image_id}")
 async def update_image(image_id: str, image_data: dict):
     try:
+        # Image bytes are immutable; only metadata can be edited here
+        for field in ("image_data", "blob_hash", "content_type", "size", "width", "height", "derivatives"):
+            image_data.pop(field, None)
         image_data["updated_at"] = datetime.utcnow()
         result = await db.images.update_one(
             {"id": image_id},
@@ -177,6 +532,8 @@ async def update_image(image_id: str, image_data: dict):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Image not found")
         
+        await invalidate_image(image_id)
+        
         return {"message": "Image updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating image: {str(e)}")
@@ -184,11 +541,14 @@ async def update_image(image_id: str, image_data: dict):
 @api_router.delete("/images/{image_id}")
 async def delete_image(image_id: str):
     try:
-        result = await db.images.delete_one({"id": image_id})
+        image = await db.images.find_one_and_delete({"id": image_id}, projection={"blob_hash": 1, "derivatives": 1})
         
-        if result.deleted_count == 0:
+        if image is None:
             raise HTTPException(status_code=404, detail="Image not found")
         
+        await blob_refs.release(image_blob_hashes(image))
+        await invalidate_image(image_id)
+        
         return {"message": "Image deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting image: {str(e)}")
@@ -196,13 +556,18 @@ async def delete_image(image_id: str):
 @api_router.put("/images/{image_id}/risk-zones")
 async def update_risk_zones(image_id: str, risk_zones: List[RiskZone]):
     try:
+        zone_docs = [zone.dict() for zone in risk_zones]
+        # MongoDB keeps milliseconds only; truncate so the cache key matches what is stored
+        updated_at = datetime.utcnow()
+        updated_at = updated_at.replace(microsecond=updated_at.microsecond // 1000 * 1000)
+        
         # Update risk zones for the image
         result = await db.images.update_one(
             {"id": image_id},
             {
                 "$set": {
-                    "risk_zones": [zone.dict() for zone in risk_zones],
-                    "updated_at": datetime.utcnow()
+                    "risk_zones": zone_docs,
+                    "updated_at": updated_at
                 }
             }
         )
@@ -210,29 +575,48 @@ async def update_risk_zones(image_id: str, risk_zones: List[RiskZone]):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Image not found")
         
+        # Rebuild the hit-test index now rather than on the next click
+        image_zone_cache.put(image_id, {"risk_zones": zone_docs, "updated_at": updated_at})
+        zone_index_cache.put(image_id, updated_at, CompiledZones(zone_docs))
+        await cache_versions.bump(f"image:{image_id}")
+        
         return {"message": "Risk zones updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating risk zones: {str(e)}")
 
+def copy_image(original_image: dict) -> GameImage:
+    """Copy-on-write duplicate: new metadata and zones pointing at the same blobs"""
+    return GameImage(
+        name=f"{original_image['name']} (Copy)",
+        blob_hash=original_image.get('blob_hash', ''),
+        content_type=original_image.get('content_type', 'image/jpeg'),
+        size=original_image.get('size', 0),
+        width=original_image.get('width', 0),
+        height=original_image.get('height', 0),
+        source_url=original_image.get('source_url', ''),
+        derivatives=original_image.get('derivatives', {}),
+        risk_zones=original_image.get('risk_zones', [])
+    )
+
 @api_router.post("/images/{image_id}/duplicate")
 async def duplicate_image(image_id: str):
     try:
-        # Get original image
-        original_image = await db.images.find_one({"id": image_id})
+        # Get original image metadata; the bytes themselves are never read
+        original_image = await db.images.find_one({"id": image_id}, {"image_data": 0})
         if not original_image:
             raise HTTPException(status_code=404, detail="Image not found")
+        # A copy can only share blobs, so a legacy image is moved into the blob store first
+        original_image = await migrated_image(original_image)
         
-        # Create duplicate
-        duplicate_image = GameImage(
-            name=f"{original_image['name']} (Copy)",
-            image_data=original_image['image_data'],
-            risk_zones=original_image.get('risk_zones', [])
-        )
+        duplicate_image = copy_image(original_image)
         
-        # Save to database
+        # Reference the shared blobs before the new document can be seen
+        await blob_refs.acquire(image_blob_hashes(original_image))
         await db.images.insert_one(duplicate_image.dict())
         
         return {"id": duplicate_image.id, "name": duplicate_image.name, "message": "Image duplicated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error duplicating image: {str(e)}")
 
@@ -252,18 +636,18 @@ async def create_game(game: GameConfig):
 @api_router.get("/games")
 async def get_games():
     try:
-        games = await db.games.find().to_list(100)
-        return serialize_doc(games)
+        games = await db.games.find({}, {"_id": 0}).to_list(100)
+        return FastJSONResponse(games)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching games: {str(e)}")
 
 @api_router.get("/games/{game_id}")
 async def get_game(game_id: str):
     try:
-        game = await db.games.find_one({"id": game_id})
+        game = await get_cached_game(game_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
-        return serialize_doc(game)
+        return FastJSONResponse(game)
     except HTTPException:
         raise
     except Exception as e:
@@ -286,6 +670,8 @@ async def update_game(game_id: str, game_data: dict):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Game not found")
         
+        await invalidate_game(game_id)
+        
         return {"message": "Game updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating game: {str(e)}")
@@ -298,18 +684,35 @@ async def delete_game(game_id: str):
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Game not found")
         
+        await invalidate_game(game_id)
+        
         return {"message": "Game deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting game: {str(e)}")
 
 @api_router.post("/games/{game_id}/duplicate")
-async def duplicate_game(game_id: str):
+async def duplicate_game(game_id: str, duplicate_images: bool = False):
     try:
         # Get original game
         original_game = await db.games.find_one({"id": game_id})
         if not original_game:
             raise HTTPException(status_code=404, detail="Game not found")
         
+        image_ids = original_game.get('images', [])
+        if duplicate_images and image_ids:
+            # Copy every image's metadata in one query and one insert; the blobs are shared
+            originals = await db.images.find({"id": {"$in": image_ids}}, {"image_data": 0}).to_list(None)
+            originals = [await migrated_image(original) for original in originals]
+            copies = {original["id"]: copy_image(original) for original in originals}
+            
+            await blob_refs.acquire_counts(Counter(
+                blob_hash for original in originals for blob_hash in image_blob_hashes(original)
+            ))
+            
+            if copies:
+                await db.images.insert_many([copy.dict() for copy in copies.values()])
+            image_ids = [copies[image_id].id for image_id in image_ids if image_id in copies]
+        
         # Create duplicate
         duplicate_game = GameConfig(
             name=f"{original_game['name']} (Copy)",
@@ -317,24 +720,31 @@ async def duplicate_game(game_id: str):
             time_limit=original_game.get('time_limit', 300),
             max_clicks=original_game.get('max_clicks', 17),
             target_risks=original_game.get('target_risks', 15),
-            images=original_game.get('images', []),
+            images=image_ids,
             branding=original_game.get('branding', {})
         )
         
         # Save to database
         await db.games.insert_one(duplicate_game.dict())
         
-        return {"id": duplicate_game.id, "name": duplicate_game.name, "message": "Game duplicated successfully"}
+        return {
+            "id": duplicate_game.id,
+            "name": duplicate_game.name,
+            "images": duplicate_game.images,
+            "message": "Game duplicated successfully"
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error duplicating game: {str(e)}")
 
 @api_router.get("/public/games/{public_link}")
 async def get_public_game(public_link: str):
     try:
-        game = await db.games.find_one({"public_link": public_link, "is_public": True})
+        game = await public_game_cache.get(public_link)
         if not game:
             raise HTTPException(status_code=404, detail="Public game not found")
-        return serialize_doc(game)
+        return FastJSONResponse(game)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching public game: {str(e)}")
 
@@ -342,29 +752,121 @@ async def get_public_game(public_link: str):
 @api_router.post("/sessions")
 async def create_session(session: GameSession):
     try:
+        # The clock and the score are the server's; ignore any values sent by the client
+        session.started_at = datetime.utcnow()
+        session.completed_at = None
+        session.time_elapsed = 0
+        session.status = "active"
+        session.score = 0
+        session.clicks_used = 0
+        session.found_risks = []
+        
         # Get game to set initial time
-        game = await db.games.find_one({"id": session.game_id})
-        if game:
-            session.time_remaining = game.get("time_limit", 300)
+        game = await get_cached_game(session.game_id)
+        session.time_remaining = session_time_limit(game)
         
         await db.sessions.insert_one(session.dict())
+        session_game_ids.set(session.id, session.game_id)
         return session
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating session: {str(e)}")
 
+async def record_results(results: List[GameResult]) -> None:
+    """Save final results and fold them into their games' statistics.
+    
+    Every code path that finishes a game goes through here so game_stats never
+    misses a result; /setup/rebuild-stats recomputes it if a write was lost.
+    """
+    docs = [result.dict() for result in results]
+    if not docs:
+        return
+    if len(docs) == 1:
+        await db.results.insert_one(docs[0])
+    else:
+        await db.results.insert_many(docs)
+    await db.game_stats.bulk_write(stats_updates(docs), ordered=False)
+
+def session_time_limit(game: Optional[dict]) -> int:
+    return game.get("time_limit", 300) if game else 300
+
+def session_time_remaining(session: dict, time_limit: int, now: Optional[datetime] = None) -> int:
+    """Seconds left on the session's clock, measured by the server from started_at"""
+    end = session.get("completed_at") or now or datetime.utcnow()
+    elapsed = (end - session["started_at"]).total_seconds()
+    return max(0, math.ceil(time_limit - elapsed))
+
+async def timeout_session(session: dict, game: Optional[dict], now: Optional[datetime] = None) -> Optional[GameResult]:
+    """Finish an active session as timed out and save its result.
+    
+    Returns None when the session had already finished, so concurrent callers
+    never store two results for one session, or when another worker holds its
+    lease: the owner has the latest clicks in memory and times it out itself.
+    """
+    now = now or datetime.utcnow()
+    hot = session_manager.get(session["id"])
+    if hot is not None:
+        # Played on this worker: persist the latest clicks and score from memory
+        await session_manager.flush([session["id"]])
+        session = hot.session
+    
+    time_limit = session_time_limit(game)
+    deadline = session["started_at"] + timedelta(seconds=time_limit)
+    completed_at = min(now, deadline)
+    update = await db.sessions.update_one(
+        {
+            "id": session["id"],
+            "status": "active",
+            "$or": [lease_available(now), {"owner": session_manager.worker_id}]
+        },
+        {"$set": {"status": "timeout", "completed_at": completed_at}}
+    )
+    if update.modified_count == 0:
+        return None
+    
+    if hot is not None:
+        hot.session.update(status="timeout", completed_at=completed_at)
+    session = {**session, "status": "timeout", "completed_at": completed_at}
+    state = session_state(session, session_time_remaining(session, time_limit))
+    result = session_result(session, state, time_limit)
+    await record_results([result])
+    return result
+
 @api_router.get("/sessions/{session_id}")
 async def get_session(session_id: str):
     try:
-        session = await db.sessions.find_one({"id": session_id})
+        hot = session_manager.get(session_id)
+        if hot is not None:
+            # The database copy may be one flush behind
+            session = {**hot.session, "found_risks": list(hot.session["found_risks"])}
+        else:
+            session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-        return serialize_doc(session)
+        
+        game = await get_cached_game(session["game_id"])
+        now = datetime.utcnow()
+        session["time_remaining"] = session_time_remaining(session, session_time_limit(game), now)
+        if session["status"] == "active" and session["time_remaining"] <= 0:
+            # Out of time: finish the session now rather than waiting for the client
+            if await timeout_session(session, game, now):
+                session["status"] = "timeout"
+        return FastJSONResponse(session)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching session: {str(e)}")
 
 @api_router.put("/sessions/{session_id}")
 async def update_session(session_id: str, session_data: dict):
     try:
+        # The clock is kept by the server from started_at, so timer fields are not writable
+        for field in ("time_remaining", "time_elapsed", "started_at"):
+            session_data.pop(field, None)
+        if not session_data:
+            if await db.sessions.count_documents({"id": session_id}, limit=1) == 0:
+                raise HTTPException(status_code=404, detail="Session not found")
+            return {"message": "Session updated successfully"}
+        
         result = await db.sessions.update_one(
             {"id": session_id},
             {"$set": session_data}
@@ -373,103 +875,441 @@ async def update_session(session_id: str, session_data: dict):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Session not found")
         
+        if "game_id" in session_data:
+            session_game_ids.delete(session_id)
+            await cache_versions.bump(f"session:{session_id}")
+        
         return {"message": "Session updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating session: {str(e)}")
 
-@api_router.post("/sessions/{session_id}/click")
-async def handle_click(session_id: str, click_data: dict):
-    try:
-        session = await db.sessions.find_one({"id": session_id})
+def session_state(session: dict, time_remaining: int) -> dict:
+    """The mutable scoring fields of a session, with the server-side time remaining"""
+    return {
+        "clicks_used": session["clicks_used"],
+        "found_risks": session["found_risks"].copy(),
+        "score": session["score"],
+        "status": session["status"],
+        "time_remaining": time_remaining
+    }
+
+def apply_click(state: dict, game: dict, zones: CompiledZones, click_x, click_y) -> dict:
+    """Score one click against an in-progress session state, updating the state in place"""
+    hit_risk = zones.hit(click_x, click_y)
+    
+    state["clicks_used"] += 1
+    if hit_risk and hit_risk["id"] not in state["found_risks"]:
+        state["found_risks"].append(hit_risk["id"])
+        state["score"] += hit_risk["points"]
+    
+    # Check if game should end
+    if state["clicks_used"] >= game["max_clicks"] or state["time_remaining"] <= 0:
+        state["status"] = "completed"
+    
+    return {
+        "hit": hit_risk is not None,
+        "risk_zone": hit_risk,
+        "clicks_used": state["clicks_used"],
+        "score": state["score"],
+        "found_risks": len(state["found_risks"]),
+        "game_status": state["status"],
+        "clicks_remaining": game["max_clicks"] - state["clicks_used"],
+        "time_remaining": state["time_remaining"]
+    }
+
+def session_result(session: dict, state: dict, time_limit: int) -> GameResult:
+    """Final result of a session that just completed"""
+    return GameResult(
+        session_id=session["id"],
+        game_id=session["game_id"],
+        player_name=session["player_name"],
+        team_name=session["team_name"],
+        total_score=state["score"],
+        total_risks_found=len(state["found_risks"]),
+        total_time_spent=time_limit - state["time_remaining"],
+        total_clicks_used=state["clicks_used"],
+        image_results=session.get("image_results", [])
+    )
+
+async def load_click_context(session_id: str):
+    """Read the session, then take its game and the current image's zones from the cache"""
+    session = await db.sessions.find_one({"id": session_id})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    game = await get_cached_game(session["game_id"])
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    current_image_id = game["images"][session["current_image_index"]]
+    zones = await get_compiled_zones(current_image_id)
+    return session, game, zones
+
+async def get_session_game_id(session_id: str) -> str:
+    game_id = session_game_ids.get(session_id)
+    if game_id is None:
+        session = await db.sessions.find_one({"id": session_id}, {"_id": 0, "game_id": 1})
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Check if game is still active
-        if session["status"] != "active":
-            return {"hit": False, "message": "Game is no longer active"}
-        
-        # Get current game and image
-        game = await db.games.find_one({"id": session["game_id"]})
+        game_id = session["game_id"]
+        session_game_ids.set(session_id, game_id)
+    return game_id
+
+def click_update_pipeline(hits: List[Optional[dict]], max_clicks: int, now: datetime) -> list:
+    """Pipeline update that scores one click entirely inside MongoDB.
+    
+    `hits` holds the zone hit on each image of the game (or None), so the
+    session's current_image_index picks the right one atomically. A zone only
+    scores the first time it is found; the session completes on its last click.
+    Running out of time is checked by the caller's filter on started_at.
+    """
+    # "ids" is the one-element list appended to found_risks
+    candidates = [{"id": hit["id"], "ids": [hit["id"]], "points": hit["points"]} if hit else None for hit in hits]
+    is_new = {"$and": [
+        {"$ne": [{"$ifNull": ["$_hit", None]}, None]},
+        {"$eq": [{"$in": ["$_hit.id", "$found_risks"]}, False]}
+    ]}
+    ends_game = {"$gte": ["$clicks_used", max_clicks]}
+    return [
+        {"$set": {"_hit": {"$arrayElemAt": [{"$literal": candidates}, "$current_image_index"]}}},
+        {"$set": {
+            "clicks_used": {"$add": ["$clicks_used", 1]},
+            "score": {"$cond": [is_new, {"$add": ["$score", "$_hit.points"]}, "$score"]},
+            "found_risks": {"$cond": [is_new, {"$concatArrays": ["$found_risks", "$_hit.ids"]}, "$found_risks"]}
+        }},
+        {"$set": {
+            "status": {"$cond": [ends_game, "completed", "$status"]},
+            "completed_at": {"$cond": [ends_game, now, None]}
+        }},
+        {"$unset": "_hit"}
+    ]
+
+# Sessions played over a socket live in memory on the worker holding their lease
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", "1"))
+session_manager = SessionStateManager(db.sessions, lease_seconds=float(os.environ.get("SESSION_LEASE_SECONDS", "15")))
+
+def session_busy() -> HTTPException:
+    return HTTPException(status_code=409, detail="Session is being played on another connection")
+
+async def score_hot_click(hot, click_x, click_y) -> dict:
+    """Score one click against a session held in memory by this worker"""
+    async with hot.lock:
+        session = hot.session
+        game = await get_cached_game(session["game_id"])
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
         
-        current_image_id = game["images"][session["current_image_index"]]
-        image = await db.images.find_one({"id": current_image_id})
-        if not image:
-            raise HTTPException(status_code=404, detail="Image not found")
+        now = datetime.utcnow()
+        time_limit = session_time_limit(game)
+        state = session_state(session, session_time_remaining(session, time_limit, now))
+        if state["status"] == "active" and state["time_remaining"] <= 0:
+            await timeout_session(session, game, now)
+            state["status"] = session["status"]
+        if state["status"] != "active":
+            return {"hit": False, "message": "Game is no longer active", "game_status": state["status"], "time_remaining": 0}
         
-        # Check if click hits any risk zone
-        click_x = click_data.get("x")
-        click_y = click_data.get("y")
-        hit_risk = None
-        
-        for risk_zone in image.get("risk_zones", []):
-            if risk_zone["type"] == "circle":
-                cx, cy, radius = risk_zone["coordinates"]
-                distance = ((click_x - cx) ** 2 + (click_y - cy) ** 2) ** 0.5
-                if distance <= radius:
-                    hit_risk = risk_zone
-                    break
-            elif risk_zone["type"] == "rectangle":
-                x, y, width, height = risk_zone["coordinates"]
-                if x <= click_x <= x + width and y <= click_y <= y + height:
-                    hit_risk = risk_zone
-                    break
-        
-        # Update session
-        new_clicks = session["clicks_used"] + 1
-        new_found_risks = session["found_risks"].copy()
-        new_score = session["score"]
-        game_status = session["status"]
-        
-        if hit_risk and hit_risk["id"] not in new_found_risks:
-            new_found_risks.append(hit_risk["id"])
-            new_score += hit_risk["points"]
+        zones = await get_compiled_zones(game["images"][session["current_image_index"]])
+        result = apply_click(state, game, zones, click_x, click_y)
+        session.update(
+            clicks_used=state["clicks_used"],
+            found_risks=state["found_risks"],
+            score=state["score"],
+            status=state["status"]
+        )
         
-        # Check if game should end
-        if new_clicks >= game["max_clicks"] or session["time_remaining"] <= 0:
-            game_status = "completed"
+        if state["status"] == "completed":
+            # Transitions are persisted before the result, not left to the next flush
+            session["completed_at"] = now
+            session_manager.mark_dirty(session["id"])
+            if session["id"] not in await session_manager.flush([session["id"]]):
+                # The lease lapsed and the session was finished elsewhere (e.g. timed out by the
+                # sweeper), which also saved its result; this game must not be recorded twice
+                current = await db.sessions.find_one({"id": session["id"]}, {"_id": 0, "status": 1})
+                status = current["status"] if current else "timeout"
+                return {"hit": False, "message": "Game is no longer active", "game_status": status, "time_remaining": 0}
+            await record_results([session_result(session, state, time_limit)])
+        else:
+            session_manager.mark_dirty(session["id"])
+        return result
+
+async def score_click(session_id: str, click_x, click_y) -> dict:
+    """Score one click for a session; shared by the REST and WebSocket endpoints"""
+    hot = session_manager.get(session_id)
+    if hot is not None:
+        return await score_hot_click(hot, click_x, click_y)
+    
+    game = await get_cached_game(await get_session_game_id(session_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    # Hit-test the click on every image of the game in memory; the database
+    # picks the one matching the session's current image
+    hits = []
+    for image_id in game["images"]:
+        try:
+            hits.append((await get_compiled_zones(image_id)).hit(click_x, click_y))
+        except HTTPException:
+            # Deleted image: nothing on it can be hit
+            hits.append(None)
+    
+    # Single round trip: score, count and finish the game atomically, only while
+    # still playable by the server's clock
+    now = datetime.utcnow()
+    time_limit = session_time_limit(game)
+    session = await db.sessions.find_one_and_update(
+        {
+            "id": session_id,
+            "status": "active",
+            "clicks_used": {"$lt": game["max_clicks"]},
+            "started_at": {"$gt": now - timedelta(seconds=time_limit)},
+            **lease_available(now)
+        },
+        click_update_pipeline(hits, game["max_clicks"], now),
+        return_document=ReturnDocument.AFTER
+    )
+    
+    # Check if game is still active
+    if session is None:
+        session = await db.sessions.find_one({"id": session_id})
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if session["status"] == "active" and session.get("lease_until") and session["lease_until"] > now:
+            raise session_busy()
+        if session["status"] == "active" and session_time_remaining(session, time_limit, now) <= 0:
+            await timeout_session(session, game, now)
+            session["status"] = "timeout"
+        return {"hit": False, "message": "Game is no longer active", "game_status": session["status"], "time_remaining": 0}
+    
+    index = session["current_image_index"]
+    hit_risk = hits[index] if 0 <= index < len(hits) else None
+    time_remaining = session_time_remaining(session, time_limit, now)
+    
+    if session["status"] == "completed":
+        # Save final result
+        state = session_state(session, time_remaining)
+        await record_results([session_result(session, state, time_limit)])
+    
+    return {
+        "hit": hit_risk is not None,
+        "risk_zone": hit_risk,
+        "clicks_used": session["clicks_used"],
+        "score": session["score"],
+        "found_risks": len(session["found_risks"]),
+        "game_status": session["status"],
+        "clicks_remaining": game["max_clicks"] - session["clicks_used"],
+        "time_remaining": time_remaining
+    }
+
+@api_router.post("/sessions/{session_id}/click")
+async def handle_click(session_id: str, click_data: dict):
+    try:
+        return await score_click(session_id, click_data.get("x"), click_data.get("y"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error handling click: {str(e)}")
+
+SESSION_TICK_INTERVAL = 1.0
+
+async def send_ticks(websocket: WebSocket, session: dict, time_limit: int):
+    """Push the server clock to the player, and time the session out when it runs out"""
+    while True:
+        time_remaining = session_time_remaining(session, time_limit)
+        await websocket.send_json({"type": "tick", "time_remaining": time_remaining})
+        if time_remaining <= 0:
+            # Re-read the session so the saved result has the latest score
+            latest = await db.sessions.find_one({"id": session["id"]})
+            if latest and latest["status"] == "active":
+                await timeout_session(latest, await get_cached_game(latest["game_id"]))
+            await websocket.send_json({"type": "game_over", "game_status": "timeout"})
+            await websocket.close()
+            return
+        await asyncio.sleep(SESSION_TICK_INTERVAL)
+
+@api_router.websocket("/sessions/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str):
+    """Gameplay channel: clicks in, hit results and timer ticks out.
+    
+    Clients send {"type": "click", "x": ..., "y": ..., "seq": ...}. Each click is
+    scored like POST /sessions/{id}/click and answered with a "click" message
+    carrying the same seq. The server also pushes a "tick" every second and a
+    "game_over" once the session ends. POST /sessions/{id}/click stays available
+    for clients that cannot open a socket. A session already held by another
+    worker is refused with close code 4409.
+    """
+    await websocket.accept()
+    session = await db.sessions.find_one({"id": session_id}, {"_id": 0, "id": 1, "game_id": 1, "status": 1, "started_at": 1})
+    if not session:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+    if session["status"] != "active":
+        await websocket.send_json({"type": "game_over", "game_status": session["status"]})
+        await websocket.close()
+        return
+    
+    time_limit = session_time_limit(await get_cached_game(session["game_id"]))
+    # Hold the session in memory for the life of the socket. If another worker
+    # already does, close so the client falls back to POST /sessions/{id}/click
+    hot = await session_manager.acquire(session_id)
+    if hot is None:
+        await websocket.close(code=4409, reason=session_busy().detail)
+        return
+    ticker = asyncio.create_task(send_ticks(websocket, session, time_limit))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON"})
+                continue
             
-            # Save final result
-            result = GameResult(
-                session_id=session_id,
-                game_id=session["game_id"],
-                player_name=session["player_name"],
-                team_name=session["team_name"],
-                total_score=new_score,
-                total_risks_found=len(new_found_risks),
-                total_time_spent=game["time_limit"] - session["time_remaining"],
-                total_clicks_used=new_clicks,
-                image_results=session.get("image_results", [])
-            )
+            if not isinstance(message, dict) or message.get("type") != "click":
+                await websocket.send_json({"type": "error", "detail": "Unknown message type"})
+                continue
+            
+            seq = message.get("seq")
+            try:
+                result = await score_click(session_id, message.get("x"), message.get("y"))
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": e.detail})
+                continue
+            except Exception as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": f"Error handling click: {str(e)}"})
+                continue
+            await websocket.send_json({"type": "click", "seq": seq, **result})
             
-            await db.results.insert_one(result.dict())
+            if result["game_status"] != "active":
+                await websocket.send_json({"type": "game_over", "game_status": result["game_status"]})
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ticker.cancel()
+        await session_manager.release(session_id)
+
+class Click(BaseModel):
+    x: float
+    y: float
+    client_timestamp: Optional[datetime] = None  # When the player clicked, for offline replays
+
+class ClickBatch(BaseModel):
+    clicks: List[Click]
+
+CLICK_BATCH_MAX = 100
+CLICK_BATCH_RETRIES = 3
+# How far behind the server a client clock may run before its replay is rejected
+CLICK_CLOCK_SKEW = timedelta(seconds=float(os.environ.get("CLICK_CLOCK_SKEW_SECONDS", "30")))
+
+def click_times(clicks: List[Click], started_at: datetime, now: datetime) -> List[datetime]:
+    """When each click happened: its client timestamp, capped at the server clock, or now.
+    
+    Replayed timestamps must not go backwards or precede the session start.
+    Timestamps up to CLICK_CLOCK_SKEW before the start are taken as the start,
+    so a client clock running slightly behind does not lose its whole batch.
+    """
+    times = []
+    previous = started_at
+    for click in clicks:
+        clicked_at = now
+        if click.client_timestamp is not None:
+            timestamp = click.client_timestamp
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            clicked_at = min(timestamp, now)
+            if started_at - CLICK_CLOCK_SKEW <= clicked_at < started_at:
+                clicked_at = started_at
+            if clicked_at < previous:
+                raise HTTPException(status_code=400, detail="Click timestamps must be in order and after the session started")
+        times.append(clicked_at)
+        previous = clicked_at
+    return times
+
+@api_router.post("/sessions/{session_id}/clicks")
+async def handle_click_batch(session_id: str, batch: ClickBatch):
+    try:
+        if len(batch.clicks) > CLICK_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {CLICK_BATCH_MAX} clicks per batch")
         
-        await db.sessions.update_one(
-            {"id": session_id},
-            {
-                "$set": {
-                    "clicks_used": new_clicks,
-                    "found_risks": new_found_risks,
-                    "score": new_score,
-                    "status": game_status,
-                    "completed_at": datetime.utcnow() if game_status == "completed" else None
+        for _ in range(CLICK_BATCH_RETRIES):
+            session, game, zones = await load_click_context(session_id)
+            
+            now = datetime.utcnow()
+            if session["status"] == "active" and session.get("lease_until") and session["lease_until"] > now:
+                # Held in memory by a socket connection; the stored copy may be stale
+                raise session_busy()
+            
+            time_limit = session_time_limit(game)
+            deadline = session["started_at"] + timedelta(seconds=time_limit)
+            times = click_times(batch.clicks, session["started_at"], now)
+            state = session_state(session, session_time_remaining(session, time_limit, now))
+            
+            # Score every click in order against the deadline, so an offline replay that
+            # arrives late still scores the clicks made in time; later ones are rejected
+            results = []
+            completed_at = None
+            for click, clicked_at in zip(batch.clicks, times):
+                if state["status"] == "active" and clicked_at >= deadline:
+                    state["status"] = "timeout"
+                if state["status"] != "active":
+                    result = {"hit": False, "message": "Game is no longer active"}
+                else:
+                    # Scored with the time left when it was made, not when it arrived
+                    state["time_remaining"] = math.ceil((deadline - clicked_at).total_seconds())
+                    result = apply_click(state, game, zones, click.x, click.y)
+                    if state["status"] == "completed":
+                        completed_at = clicked_at
+                result["client_timestamp"] = click.client_timestamp
+                results.append(result)
+            # A game finished by a replayed click is timed up to that click, not to the upload
+            state["time_remaining"] = session_time_remaining({**session, "completed_at": completed_at}, time_limit, now)
+            if state["status"] == "active" and state["time_remaining"] <= 0:
+                state["status"] = "timeout"
+            
+            if state["clicks_used"] == session["clicks_used"] and state["status"] == session["status"]:
+                # Nothing was scored, the session is unchanged
+                break
+            
+            # One atomic write for the whole batch, guarded against concurrent clicks
+            if state["status"] == "timeout":
+                completed_at = deadline
+            update = await db.sessions.update_one(
+                {"id": session_id, "status": "active", "clicks_used": session["clicks_used"], **lease_available(now)},
+                {
+                    "$set": {
+                        "clicks_used": state["clicks_used"],
+                        "found_risks": state["found_risks"],
+                        "score": state["score"],
+                        "status": state["status"],
+                        "completed_at": completed_at
+                    }
                 }
-            }
-        )
+            )
+            if update.modified_count == 0:
+                # Another click changed the session in between; score again from fresh state
+                continue
+            
+            if state["status"] != "active":
+                await record_results([session_result(session, state, time_limit)])
+            break
+        else:
+            raise HTTPException(status_code=409, detail="Session was modified concurrently, retry the batch")
         
         return {
-            "hit": hit_risk is not None,
-            "risk_zone": hit_risk,
-            "clicks_used": new_clicks,
-            "score": new_score,
-            "found_risks": len(new_found_risks),
-            "game_status": game_status,
-            "clicks_remaining": game["max_clicks"] - new_clicks,
-            "time_remaining": session["time_remaining"]
+            "results": results,
+            "clicks_used": state["clicks_used"],
+            "score": state["score"],
+            "found_risks": len(state["found_risks"]),
+            "game_status": state["status"],
+            "clicks_remaining": game["max_clicks"] - state["clicks_used"],
+            "time_remaining": state["time_remaining"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error handling click: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error handling clicks: {str(e)}")
 
 @api_router.post("/sessions/{session_id}/timeout")
 async def handle_timeout(session_id: str):
@@ -478,42 +1318,96 @@ async def handle_timeout(session_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Update session status to timeout
-        await db.sessions.update_one(
-            {"id": session_id},
-            {
-                "$set": {
-                    "status": "timeout",
-                    "completed_at": datetime.utcnow()
-                }
-            }
-        )
+        now = datetime.utcnow()
+        if (session["status"] == "active" and session.get("lease_until") and session["lease_until"] > now
+                and session.get("owner") != session_manager.worker_id):
+            # Held in memory by a socket connection, whose ticker times it out
+            raise session_busy()
         
-        # Save final result
-        game = await db.games.find_one({"id": session["game_id"]})
-        result = GameResult(
-            session_id=session_id,
-            game_id=session["game_id"],
-            player_name=session["player_name"],
-            team_name=session["team_name"],
-            total_score=session["score"],
-            total_risks_found=len(session["found_risks"]),
-            total_time_spent=game["time_limit"] if game else 300,
-            total_clicks_used=session["clicks_used"],
-            image_results=session.get("image_results", [])
-        )
-        
-        await db.results.insert_one(result.dict())
+        # Update session status to timeout and save the final result, once
+        game = await get_cached_game(session["game_id"])
+        result = await timeout_session(session, game, now)
+        if result is None:
+            return {"message": "Session already finished"}
         
         return {"message": "Session timed out", "result": result}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error handling timeout: {str(e)}")
 
+# Abandoned sessions (closed tabs) are timed out in the background instead of
+# waiting for a client call that never comes
+SESSION_SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "30"))
+SESSION_SWEEP_BATCH = int(os.environ.get("SESSION_SWEEP_BATCH", "1000"))
+
+async def sweep_expired_sessions(now: Optional[datetime] = None) -> int:
+    """Time out every expired active session and save their results in bulk.
+    
+    Sessions are tagged with a sweep id in the same update that finishes them,
+    so only the ones this sweep actually changed get a result, even when
+    several workers sweep at once or a player's own timeout races the sweep.
+    Returns the number of sessions swept.
+    """
+    now = now or datetime.utcnow()
+    # No session can expire before the shortest time limit of any game
+    shortest = await db.games.find_one({}, {"_id": 0, "time_limit": 1}, sort=[("time_limit", 1)])
+    cutoff = now - timedelta(seconds=session_time_limit(shortest))
+    
+    # Leased sessions are timed out by the worker holding them, from its latest state
+    candidates = db.sessions.find(
+        {"status": "active", "started_at": {"$lte": cutoff}, **lease_available(now)},
+        {"_id": 0, "id": 1, "game_id": 1, "started_at": 1}
+    ).sort("started_at", 1).limit(SESSION_SWEEP_BATCH)
+    
+    expired: Dict[str, List[str]] = {}
+    time_limits: Dict[str, int] = {}
+    async for session in candidates:
+        game_id = session["game_id"]
+        if game_id not in time_limits:
+            time_limits[game_id] = session_time_limit(await get_cached_game(game_id))
+        if session_time_remaining(session, time_limits[game_id], now) <= 0:
+            expired.setdefault(game_id, []).append(session["id"])
+    if not expired:
+        return 0
+    
+    sweep_id = str(uuid.uuid4())
+    for game_id, session_ids in expired.items():
+        # completed_at is each session's own deadline, not the time of the sweep
+        await db.sessions.update_many(
+            {"id": {"$in": session_ids}, "status": "active", **lease_available(now)},
+            [{"$set": {
+                "status": "timeout",
+                "completed_at": {"$add": ["$started_at", time_limits[game_id] * 1000]},
+                "sweep_id": sweep_id
+            }}]
+        )
+    
+    # Looked up by id so the unique id index serves it; sweep_id picks the ones this sweep changed
+    expired_ids = [session_id for session_ids in expired.values() for session_id in session_ids]
+    results = []
+    async for session in db.sessions.find({"id": {"$in": expired_ids}, "sweep_id": sweep_id}, {"_id": 0}):
+        time_limit = time_limits[session["game_id"]]
+        state = session_state(session, session_time_remaining(session, time_limit))
+        results.append(session_result(session, state, time_limit))
+    await record_results(results)
+    return len(results)
+
+async def session_sweeper(interval: float):
+    while True:
+        try:
+            swept = await sweep_expired_sessions()
+            if swept:
+                logger.info(f"Timed out {swept} expired sessions")
+        except Exception:
+            logger.exception("Session sweep failed")
+        await asyncio.sleep(interval)
+
 # Results Routes
 @api_router.post("/results")
 async def save_result(result: GameResult):
     try:
-        await db.results.insert_one(result.dict())
+        await record_results([result])
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving result: {str(e)}")
@@ -521,160 +1415,157 @@ async def save_result(result: GameResult):
 @api_router.get("/results")
 async def get_results():
     try:
-        results = await db.results.find().to_list(100)
-        return serialize_doc(results)
+        results = await db.results.find({}, {"_id": 0}).to_list(100)
+        return FastJSONResponse(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching results: {str(e)}")
 
+RESULTS_PAGE_SIZE = 50
+RESULTS_PAGE_SIZE_MAX = 500
+
+async def game_results_page(game_id: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """One page of a game's results, newest first"""
+    limit = max(1, min(limit, RESULTS_PAGE_SIZE_MAX))
+    results = await db.results.find(
+        {"game_id": game_id, **keyset_filter(cursor, descending=True)},
+        {"_id": 0}
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit).to_list(limit)
+    
+    next_cursor = None
+    if len(results) == limit:
+        next_cursor = encode_cursor(results[-1]["created_at"], results[-1]["id"])
+    return {"items": results, "next_cursor": next_cursor}
+
 @api_router.get("/results/game/{game_id}")
-async def get_game_results(game_id: str):
+async def get_game_results(game_id: str, limit: int = RESULTS_PAGE_SIZE, cursor: Optional[str] = None):
     try:
-        results = await db.results.find({"game_id": game_id}).to_list(100)
-        return serialize_doc(results)
+        return FastJSONResponse(await game_results_page(game_id, limit, cursor))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching game results: {str(e)}")
 
 @api_router.get("/results/analytics/{game_id}")
-async def get_game_analytics(game_id: str):
+async def get_game_analytics(game_id: str, limit: int = RESULTS_PAGE_SIZE):
     try:
-        results = await db.results.find({"game_id": game_id}).to_list(100)
+        # Totals are kept up to date in game_stats as results are recorded; only the first
+        # page of rows is returned, the rest comes from /results/game/{game_id}
+        stats = await load_game_stats(db, game_id)
         
-        if not results:
-            return {"total_players": 0, "average_score": 0, "average_time": 0}
+        if not stats:
+            return {
+                "total_players": 0, "average_score": 0, "average_time": 0,
+                "total_clicks": 0, "total_risks_found": 0,
+                "results": [], "results_next_cursor": None
+            }
         
-        total_players = len(results)
-        total_score = sum(r.get("total_score", 0) for r in results)
-        total_time = sum(r.get("total_time_spent", 0) for r in results)
+        page = await game_results_page(game_id, limit)
+        analytics = summarize(stats)
+        analytics["results"] = page["items"]
+        analytics["results_next_cursor"] = page["next_cursor"]
         
-        analytics = {
-            "total_players": total_players,
-            "average_score": round(total_score / total_players, 2),
-            "average_time": round(total_time / total_players, 2),
-            "total_clicks": sum(r.get("total_clicks_used", 0) for r in results),
-            "total_risks_found": sum(r.get("total_risks_found", 0) for r in results),
-            "results": serialize_doc(results)
+        return FastJSONResponse(analytics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching analytics: {str(e)}")
+
+export_jobs = ExportJobs(db, blob_store, blob_refs, workers=int(os.environ.get("EXPORT_WORKERS", "2")))
+
+class ExportRequest(BaseModel):
+    game_id: str  # A game id, or "all"
+    format: str = "csv"
+
+def artifact_response(artifact: dict) -> StreamingResponse:
+    return StreamingResponse(
+        blob_store.stream(artifact["blob_hash"]),
+        media_type=artifact["content_type"],
+        headers={
+            "Content-Disposition": f"attachment; filename={artifact['filename']}",
+            "Content-Length": str(artifact["size"])
         }
+    )
+
+@api_router.post("/exports")
+async def create_export(request: ExportRequest):
+    try:
+        if request.format not in FORMATS:
+            raise HTTPException(status_code=400, detail="Unsupported format")
+        job = await export_jobs.submit(request.game_id, request.format)
+        return FastJSONResponse(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating export: {str(e)}")
+
+@api_router.get("/exports/{job_id}")
+async def get_export(job_id: str):
+    try:
+        job = await export_jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Export not found")
+        return FastJSONResponse(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching export: {str(e)}")
+
+@api_router.get("/exports/{job_id}/download")
+async def download_export(job_id: str):
+    try:
+        job = await export_jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Export not found")
+        if job["status"] != "completed":
+            raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
         
-        return analytics
+        artifact = await db.export_artifacts.find_one({"_id": job["artifact_id"]})
+        if artifact is None:
+            # Replaced by an export of newer results
+            raise HTTPException(status_code=410, detail="Export has expired, request a new one")
+        return artifact_response(artifact)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error downloading export: {str(e)}")
 
 @api_router.get("/results/export/{game_id}")
 async def export_results(game_id: str, format: str = "csv"):
     try:
+        export_format = FORMATS.get(format)
+        if export_format is None:
+            raise HTTPException(status_code=400, detail="Unsupported format")
+        
+        # An export generated earlier for the same results is served as is
+        artifact = await export_jobs.cached_artifact(game_id, format)
+        if artifact is not None:
+            return artifact_response(artifact)
+        
         # Handle 'all' case for all games
-        if game_id == "all":
-            results = await db.results.find().to_list(1000)
-        else:
-            results = await db.results.find({"game_id": game_id}).to_list(100)
+        query = {} if game_id == "all" else {"game_id": game_id}
         
-        if format == "csv":
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(["Player Name", "Team Name", "Score", "Risks Found", "Time Spent", "Clicks Used", "Date"])
-            
-            for result in results:
-                writer.writerow([
-                    result.get("player_name", ""),
-                    result.get("team_name", ""),
-                    result.get("total_score", 0),
-                    result.get("total_risks_found", 0),
-                    result.get("total_time_spent", 0),
-                    result.get("total_clicks_used", 0),
-                    result.get("created_at", "")
-                ])
-            
-            output.seek(0)
+        if export_format.stream is not None:
+            # CSV and NDJSON are encoded as the cursor yields them, so any number of results streams
+            cursor = db.results.find(query, EXPORT_PROJECTION, batch_size=1000)
             return StreamingResponse(
-                io.BytesIO(output.getvalue().encode()),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=game_results_{game_id}.csv"}
+                export_format.stream(cursor),
+                media_type=export_format.content_type,
+                headers={"Content-Disposition": f"attachment; filename={artifact_filename(game_id, format)}"}
             )
         
-        elif format == "excel":
-            output = io.BytesIO()
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            sheet.title = "Game Results"
-            
-            # Headers
-            headers = ["Player Name", "Team Name", "Score", "Risks Found", "Time Spent", "Clicks Used", "Date"]
-            sheet.append(headers)
-            
-            # Data
-            for result in results:
-                sheet.append([
-                    result.get("player_name", ""),
-                    result.get("team_name", ""),
-                    result.get("total_score", 0),
-                    result.get("total_risks_found", 0),
-                    result.get("total_time_spent", 0),
-                    result.get("total_clicks_used", 0),
-                    str(result.get("created_at", ""))
-                ])
-            
-            workbook.save(output)
-            output.seek(0)
-            
-            return StreamingResponse(
-                output,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename=game_results_{game_id}.xlsx"}
-            )
-            
-        elif format == "pdf":
-            output = io.BytesIO()
-            doc = canvas.Canvas(output, pagesize=letter)
-            width, height = letter
-            
-            # Title
-            doc.setFont("Helvetica-Bold", 16)
-            doc.drawString(50, height - 50, f"Game Results Report - {game_id}")
-            
-            # Headers
-            doc.setFont("Helvetica-Bold", 10)
-            y_position = height - 100
-            headers = ["Player", "Team", "Score", "Risks", "Time", "Clicks", "Date"]
-            x_positions = [50, 130, 190, 240, 290, 340, 390]
-            
-            for i, header in enumerate(headers):
-                doc.drawString(x_positions[i], y_position, header)
-            
-            # Data
-            doc.setFont("Helvetica", 9)
-            y_position -= 20
-            
-            for result in results:
-                if y_position < 50:  # Start new page if needed
-                    doc.showPage()
-                    y_position = height - 50
-                
-                data = [
-                    result.get("player_name", "")[:15],  # Truncate long names
-                    result.get("team_name", "")[:10],
-                    str(result.get("total_score", 0)),
-                    str(result.get("total_risks_found", 0)),
-                    str(result.get("total_time_spent", 0)),
-                    str(result.get("total_clicks_used", 0)),
-                    str(result.get("created_at", ""))[:10]  # Date only
-                ]
-                
-                for i, value in enumerate(data):
-                    doc.drawString(x_positions[i], y_position, str(value))
-                
-                y_position -= 15
-            
-            doc.save()
-            output.seek(0)
-            
-            return StreamingResponse(
-                output,
-                media_type="application/pdf",
-                headers={"Content-Disposition": f"attachment; filename=game_results_{game_id}.pdf"}
-            )
+        # Workbooks, PDFs and Parquet files are built in a temporary file, then streamed and removed
+        fd, path = tempfile.mkstemp(prefix="export-", suffix=f".{export_format.extension}")
+        os.close(fd)
+        try:
+            await export_jobs.write(game_id, format, path)
+        except BaseException:
+            os.unlink(path)
+            raise
         
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported format")
+        return StreamingResponse(
+            read_file_chunks(path),
+            media_type=export_format.content_type,
+            headers={"Content-Disposition": f"attachment; filename={artifact_filename(game_id, format)}"},
+            background=BackgroundTask(os.unlink, path)
+        )
             
     except HTTPException:
         raise
@@ -702,11 +1593,10 @@ async def create_sample_images():
         
         created_images = []
         for sample in sample_images:
-            # For now, we'll store the URL as a placeholder
-            # In production, you'd fetch and convert to base64
+            # Sample images are referenced by URL rather than stored in the blob store
             image_doc = GameImage(
                 name=sample["name"],
-                image_data=sample["url"]  # Using URL as placeholder
+                source_url=sample["url"]
             )
             
             await db.images.insert_one(image_doc.dict())
@@ -716,9 +1606,74 @@ async def create_sample_images():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating sample images: {str(e)}")
 
+# Move legacy inline base64 images into the blob store
+@api_router.post("/setup/migrate-images")
+async def migrate_inline_images():
+    try:
+        migrated = 0
+        # Iterate one document at a time so only a single image is held in memory
+        async for image in db.images.find({"image_data": {"$exists": True}}, {"id": 1, "image_data": 1}).batch_size(1):
+            await migrate_image(image["id"], image.get("image_data") or "")
+            migrated += 1
+        
+        # Recount blob references from the image documents themselves
+        pipeline = [
+            {"$project": {"hashes": {"$setUnion": [
+                ["$blob_hash"],
+                {"$map": {
+                    "input": {"$objectToArray": {"$ifNull": ["$derivatives", {}]}},
+                    "as": "derivative",
+                    "in": "$$derivative.v.blob_hash"
+                }}
+            ]}}},
+            {"$unwind": "$hashes"},
+            {"$match": {"hashes": {"$nin": ["", None]}}},
+            {"$group": {"_id": "$hashes", "refs": {"$sum": 1}}}
+        ]
+        counts = Counter({doc["_id"]: doc["refs"] async for doc in db.images.aggregate(pipeline)})
+        # Cached export artifacts hold references in the same table
+        async for artifact in db.export_artifacts.find({}, {"_id": 0, "blob_hash": 1}):
+            counts[artifact["blob_hash"]] += 1
+        await blob_refs.rebuild(counts)
+        
+        return {"message": "Images migrated", "migrated": migrated, "blobs": len(counts)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error migrating images: {str(e)}")
+
+@api_router.post("/setup/rebuild-stats")
+async def rebuild_game_stats():
+    """Recompute every game's statistics from the results collection.
+    
+    For repairs after a failed write or a manual change to results; results
+    recorded while the rebuild runs may be missed, so run it when quiet.
+    """
+    try:
+        await db.results.aggregate(rebuild_pipeline()).to_list(None)
+        games = await db.game_stats.count_documents({})
+        return {"message": "Game statistics rebuilt", "games": games}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rebuilding statistics: {str(e)}")
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {"caches": [cache.stats() for cache in caches]}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse uploads that announce a size over the limit before the body is read
+    if request.url.path == "/api/images/upload":
+        content_length = request.headers.get("content-length")
+        # Allow some headroom for the multipart envelope and the name field
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + 64 * 1024:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Image exceeds the {MAX_UPLOAD_SIZE} byte upload limit"}
+            )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -734,6 +1689,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_db_client():
+    await ensure_indexes(db)
+    # Logs (or with INDEX_CHECK=strict, refuses to start on) hot queries that would scan
+    await verify_indexes(db)
+    # Results saved before game_stats existed (a fresh deploy) would otherwise read as zero
+    if await backfill_game_stats(db):
+        logger.info("Built game_stats from existing results")
+    app.state.cache_sync = asyncio.create_task(cache_versions.run(CACHE_SYNC_INTERVAL))
+    app.state.session_sweeper = asyncio.create_task(session_sweeper(SESSION_SWEEP_INTERVAL))
+    app.state.session_flusher = asyncio.create_task(session_manager.run(SESSION_FLUSH_INTERVAL))
+    app.state.export_heartbeat = asyncio.create_task(export_jobs.run())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    app.state.cache_sync.cancel()
+    app.state.session_sweeper.cancel()
+    app.state.session_flusher.cancel()
+    app.state.export_heartbeat.cancel()
+    # Write back sessions still held in memory before the connection goes away
+    await session_manager.close()
+    await export_jobs.shutdown()
+    client.close()
+    image_pool.shutdown()
+    report_pool.shutdown()
\ No newline at end of file
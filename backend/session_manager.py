@@ -0,0 +1,179 @@
+"""Hot state for the game sessions being played on this worker.
+
+While a player is connected, the worker holding their session keeps the
+session document in memory and scores clicks against it. Changes are written
+back to MongoDB in batches every flush interval (write-behind) and straight
+away on every status transition, so a crash loses at most one interval of
+clicks and never a finished game.
+
+Only one worker may hold a session at a time. Ownership is a lease stored on
+the session document (owner, lease_until) and renewed by the flushes; a lease
+left behind by a crashed worker simply expires.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Session fields the scoring path changes, written back on every flush
+PERSISTED_FIELDS = ("clicks_used", "found_risks", "score", "status", "completed_at", "current_image_index")
+
+
+def lease_available(now: datetime) -> dict:
+    """Filter matching sessions no worker holds a live lease on"""
+    return {"lease_until": {"$not": {"$gt": now}}}
+
+
+class HotSession:
+    """One in-memory session; `lock` serializes clicks scored against it"""
+
+    def __init__(self, session: dict, lease_until: datetime):
+        self.session = session
+        self.lease_until = lease_until
+        self.lock = asyncio.Lock()
+        self.dirty = False
+        # Open connections using this session; it is released when the last one closes
+        self.connections = 1
+
+
+class SessionStateManager:
+    def __init__(self, collection, lease_seconds: float = 15):
+        self.collection = collection
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = timedelta(seconds=lease_seconds)
+        self.sessions: Dict[str, HotSession] = {}
+
+    def get(self, session_id: str) -> Optional[HotSession]:
+        return self.sessions.get(session_id)
+
+    async def acquire(self, session_id: str) -> Optional[HotSession]:
+        """Load an active session into memory under a lease.
+
+        Returns None when the session is not active or another worker holds it;
+        callers then fall back to scoring against the database.
+        """
+        hot = self.sessions.get(session_id)
+        if hot is not None:
+            hot.connections += 1
+            return hot
+
+        now = datetime.utcnow()
+        lease_until = now + self.lease
+        lease = {"owner": self.worker_id, "lease_until": lease_until}
+        session = await self.collection.find_one_and_update(
+            {"id": session_id, "status": "active", **lease_available(now)},
+            {"$set": lease},
+            projection={"_id": 0}
+        )
+        if session is None:
+            return None
+        session.update(lease)
+
+        # Another connection may have loaded it while this one waited
+        hot = self.sessions.get(session_id)
+        if hot is not None:
+            hot.connections += 1
+            return hot
+        hot = self.sessions[session_id] = HotSession(session, lease_until)
+        return hot
+
+    def mark_dirty(self, session_id: str) -> None:
+        hot = self.sessions.get(session_id)
+        if hot is not None:
+            hot.dirty = True
+
+    async def flush(self, session_ids: Optional[Iterable[str]] = None) -> Set[str]:
+        """Write changed sessions back in one bulk_write and renew leases close to expiry.
+
+        Returns the ids whose write was accepted. A session whose write matched
+        nothing was finished elsewhere or taken over after our lease lapsed; it
+        is dropped from memory so nothing more is scored against it here.
+        """
+        now = datetime.utcnow()
+        lease_until = now + self.lease
+        # Tags this flush's writes, to tell which ones matched when not all did
+        flush_id = uuid.uuid4().hex
+        flushed = {}
+        updates = []
+        for session_id in (self.sessions if session_ids is None else session_ids):
+            hot = self.sessions.get(session_id)
+            if hot is None:
+                continue
+            renew = hot.lease_until - now < self.lease / 2
+            if not hot.dirty and not renew:
+                continue
+            fields = {"lease_until": lease_until, "flush_id": flush_id}
+            if hot.dirty:
+                fields.update({field: hot.session.get(field) for field in PERSISTED_FIELDS})
+                hot.dirty = False
+            # The status guard keeps a late flush from reviving a session the sweeper finished
+            updates.append(UpdateOne(
+                {"id": session_id, "owner": self.worker_id, "status": "active"},
+                {"$set": fields}
+            ))
+            flushed[session_id] = hot
+        if not updates:
+            return set()
+
+        try:
+            result = await self.collection.bulk_write(updates, ordered=False)
+        except Exception:
+            # Keep the changes so the next flush retries them
+            for hot in flushed.values():
+                hot.dirty = True
+            raise
+
+        accepted = set(flushed)
+        if result.matched_count < len(updates):
+            accepted = {doc["id"] async for doc in self.collection.find(
+                {"id": {"$in": list(flushed)}, "flush_id": flush_id}, {"_id": 0, "id": 1}
+            )}
+        for session_id, hot in flushed.items():
+            if session_id in accepted:
+                hot.lease_until = lease_until
+            else:
+                logger.warning(f"Session {session_id} changed elsewhere; dropping it from memory")
+                self.sessions.pop(session_id, None)
+        return accepted
+
+    async def release(self, session_id: str) -> None:
+        """Drop a connection; the last one flushes the session and gives up the lease"""
+        hot = self.sessions.get(session_id)
+        if hot is None:
+            return
+        hot.connections -= 1
+        if hot.connections > 0:
+            return
+
+        async with hot.lock:
+            await self.flush([session_id])
+            self.sessions.pop(session_id, None)
+        await self.collection.update_one(
+            {"id": session_id, "owner": self.worker_id},
+            {"$unset": {"owner": "", "lease_until": ""}}
+        )
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Session flush failed")
+
+    async def close(self) -> None:
+        """Persist every hot session and release their leases, for shutdown"""
+        await self.flush()
+        if self.sessions:
+            await self.collection.update_many(
+                {"id": {"$in": list(self.sessions)}, "owner": self.worker_id},
+                {"$unset": {"owner": "", "lease_until": ""}}
+            )
+        self.sessions.clear()
@@ -118,6 +118,23 @@ def test_image_management():
                 log_test("image_management", "Get specific image", False, f"Status: {response.status_code}")
         except Exception as e:
             log_test("image_management", "Get specific image", False, str(e))
+    
+    # Test 4: Raw image bytes with caching and range support
+    if created_image_id:
+        try:
+            response = requests.get(f"{API_URL}/images/{created_image_id}/raw")
+            etag = response.headers.get('ETag')
+            if response.status_code == 200 and etag and 'immutable' in response.headers.get('Cache-Control', ''):
+                cached = requests.get(f"{API_URL}/images/{created_image_id}/raw", headers={'If-None-Match': etag})
+                partial = requests.get(f"{API_URL}/images/{created_image_id}/raw", headers={'Range': 'bytes=0-9'})
+                if cached.status_code == 304 and partial.status_code == 206 and partial.content == response.content[:10]:
+                    log_test("image_management", "Get raw image", True)
+                else:
+                    log_test("image_management", "Get raw image", False, f"If-None-Match: {cached.status_code}, Range: {partial.status_code}")
+            else:
+                log_test("image_management", "Get raw image", False, f"Status: {response.status_code}, Headers: {dict(response.headers)}")
+        except Exception as e:
+            log_test("image_management", "Get raw image", False, str(e))
 
 def test_risk_zone_annotation():
     """Test Risk Zone Annotation API"""
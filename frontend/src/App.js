@@ -5,6 +5,9 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Image URLs from the API are either absolute (external images) or relative to the backend
+const resolveImageUrl = (url) => (url && !url.startsWith('http') ? `${BACKEND_URL}${url}` : url);
+
 const RiskHuntBuilder = () => {
   const [activeTab, setActiveTab] = useState('builder');
   const [images, setImages] = useState([]);
@@ -340,8 +343,14 @@ const RiskHuntBuilder = () => {
     }
     
     try {
-      const response = await axios.get(`${API}/images`);
-      const data = response.data;
+      // The image list is paginated with keyset cursors; follow them to load the whole library
+      const data = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API}/images`, { params: cursor ? { cursor } : {} });
+        data.push(...response.data.items);
+        cursor = response.data.next_cursor;
+      } while (cursor);
       
       // Cache the data
       apiCache.current.set(cacheKey, {
@@ -424,6 +433,23 @@ const RiskHuntBuilder = () => {
     }
   };
 
+  // Analytics only embed the newest results; older pages follow the cursor
+  const loadMoreAnalyticsResults = async (gameId) => {
+    if (!analytics?.results_next_cursor) return;
+    try {
+      const response = await axios.get(`${API}/results/game/${gameId}`, {
+        params: { cursor: analytics.results_next_cursor }
+      });
+      setAnalytics(prev => ({
+        ...prev,
+        results: [...prev.results, ...response.data.items],
+        results_next_cursor: response.data.next_cursor
+      }));
+    } catch (error) {
+      console.error('Error loading results:', error);
+    }
+  };
+
   // Load data on component mount
   useEffect(() => {
     loadImages();
@@ -745,29 +771,8 @@ const RiskHuntBuilder = () => {
     showNotification('Duplicating game...', 'info');
     
     try {
-      const response = await axios.post(`${API}/games/${gameId}/duplicate`);
-      
-      // Get the original game to copy its images
-      const originalGame = games.find(g => g.id === gameId);
-      if (originalGame && originalGame.images && originalGame.images.length > 0) {
-        // Duplicate all images associated with the game
-        const duplicatedImages = [];
-        for (const imageId of originalGame.images) {
-          try {
-            const imageResponse = await axios.post(`${API}/images/${imageId}/duplicate`);
-            duplicatedImages.push(imageResponse.data.id);
-          } catch (imageError) {
-            console.error('Error duplicating image:', imageError);
-          }
-        }
-        
-        // Update the duplicated game with the new image IDs
-        if (duplicatedImages.length > 0) {
-          await axios.put(`${API}/games/${response.data.id}`, {
-            images: duplicatedImages
-          });
-        }
-      }
+      // The server copies the image metadata and shares the image files with the original
+      await axios.post(`${API}/games/${gameId}/duplicate`, null, { params: { duplicate_images: true } });
       
       loadGames();
       showNotification('Game duplicated successfully with all images and risk zones', 'success');
@@ -820,6 +825,90 @@ const RiskHuntBuilder = () => {
     }
   };
 
+  // Show the outcome of a scored click, whether it came over the socket or REST
+  const applyClickResult = (data, x, y, ctx) => {
+    if (data.hit) {
+      // Show hit animation with optimized rendering
+      showNotification(`🎯 Risk Found: ${data.risk_zone.description}`, 'success');
+      
+      // Optimized visual feedback for hit
+      requestAnimationFrame(() => {
+        ctx.save();
+        ctx.strokeStyle = '#10b981';
+        ctx.lineWidth = 3;
+        ctx.beginPath();
+        ctx.arc(x, y, 20, 0, 2 * Math.PI);
+        ctx.stroke();
+        ctx.restore();
+      });
+      
+      // Show the found risk zone temporarily with better validation
+      const foundZone = data.risk_zone;
+      if (foundZone && foundZone.coordinates && Array.isArray(foundZone.coordinates)) {
+        requestAnimationFrame(() => {
+          ctx.save();
+          ctx.fillStyle = 'rgba(16, 185, 129, 0.3)';
+          ctx.strokeStyle = '#10b981';
+          ctx.lineWidth = 2;
+          
+          if (foundZone.type === 'circle' && foundZone.coordinates.length >= 3) {
+            const [cx, cy, radius] = foundZone.coordinates;
+            if (typeof cx === 'number' && typeof cy === 'number' && typeof radius === 'number') {
+              ctx.beginPath();
+              ctx.arc(cx, cy, radius, 0, 2 * Math.PI);
+              ctx.fill();
+              ctx.stroke();
+            }
+          } else if (foundZone.type === 'rectangle' && foundZone.coordinates.length >= 4) {
+            const [rx, ry, width, height] = foundZone.coordinates;
+            if (typeof rx === 'number' && typeof ry === 'number' && typeof width === 'number' && typeof height === 'number') {
+              ctx.fillRect(rx, ry, width, height);
+              ctx.strokeRect(rx, ry, width, height);
+            }
+          }
+          ctx.restore();
+        });
+      }
+      
+    } else {
+      showNotification('No risk found here', 'info');
+      
+      // Optimized visual feedback for miss
+      requestAnimationFrame(() => {
+        ctx.save();
+        ctx.strokeStyle = '#ef4444';
+        ctx.lineWidth = 2;
+        ctx.beginPath();
+        ctx.arc(x, y, 10, 0, 2 * Math.PI);
+        ctx.stroke();
+        ctx.restore();
+      });
+    }
+    
+    // Update game session with new data using optimized state update
+    setGameSession(prev => normalizeGameSession({
+      ...prev,
+      clicks_used: data.clicks_used,
+      score: data.score,
+      found_risks: Array.isArray(data.found_risks) ? data.found_risks : (prev.found_risks || [])
+    }));
+
+    // The server keeps the authoritative clock; resync the local countdown to it
+    if (typeof data.time_remaining === 'number') {
+      setTimeRemaining(data.time_remaining);
+    }
+
+    // Check if game should end
+    if (data.game_status === 'completed' || data.game_status === 'timeout' || data.clicks_remaining <= 0) {
+      handleGameEnd();
+    }
+    
+    // Clear visual feedback and redraw zones after a delay
+    setTimeout(() => {
+      drawRiskZones(showCorrectionScreen);
+    }, 300);
+  };
+
   // Debounced click handler for better performance
   const debouncedClickHandler = useRef(null);
   
@@ -852,86 +941,21 @@ const RiskHuntBuilder = () => {
       ctx.restore();
     });
     
-    // Debounce the API call to prevent rapid clicks
+    // Over the gameplay socket each click is sent at once and answered by seq
+    const socket = gameSocket.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      const seq = ++clickSeq.current;
+      pendingClicks.current.set(seq, { x, y, ctx });
+      socket.send(JSON.stringify({ type: 'click', x, y, seq }));
+      return;
+    }
+    
+    // REST fallback: debounce the API call to prevent rapid clicks
     debouncedClickHandler.current = setTimeout(async () => {
       try {
         const response = await axios.post(`${API}/sessions/${gameSession.id}/click`, { x, y });
         
-        if (response.data.hit) {
-          // Show hit animation with optimized rendering
-          showNotification(`🎯 Risk Found: ${response.data.risk_zone.description}`, 'success');
-          
-          // Optimized visual feedback for hit
-          requestAnimationFrame(() => {
-            ctx.save();
-            ctx.strokeStyle = '#10b981';
-            ctx.lineWidth = 3;
-            ctx.beginPath();
-            ctx.arc(x, y, 20, 0, 2 * Math.PI);
-            ctx.stroke();
-            ctx.restore();
-          });
-          
-          // Show the found risk zone temporarily with better validation
-          const foundZone = response.data.risk_zone;
-          if (foundZone && foundZone.coordinates && Array.isArray(foundZone.coordinates)) {
-            requestAnimationFrame(() => {
-              ctx.save();
-              ctx.fillStyle = 'rgba(16, 185, 129, 0.3)';
-              ctx.strokeStyle = '#10b981';
-              ctx.lineWidth = 2;
-              
-              if (foundZone.type === 'circle' && foundZone.coordinates.length >= 3) {
-                const [cx, cy, radius] = foundZone.coordinates;
-                if (typeof cx === 'number' && typeof cy === 'number' && typeof radius === 'number') {
-                  ctx.beginPath();
-                  ctx.arc(cx, cy, radius, 0, 2 * Math.PI);
-                  ctx.fill();
-                  ctx.stroke();
-                }
-              } else if (foundZone.type === 'rectangle' && foundZone.coordinates.length >= 4) {
-                const [rx, ry, width, height] = foundZone.coordinates;
-                if (typeof rx === 'number' && typeof ry === 'number' && typeof width === 'number' && typeof height === 'number') {
-                  ctx.fillRect(rx, ry, width, height);
-                  ctx.strokeRect(rx, ry, width, height);
-                }
-              }
-              ctx.restore();
-            });
-          }
-          
-        } else {
-          showNotification('No risk found here', 'info');
-          
-          // Optimized visual feedback for miss
-          requestAnimationFrame(() => {
-            ctx.save();
-            ctx.strokeStyle = '#ef4444';
-            ctx.lineWidth = 2;
-            ctx.beginPath();
-            ctx.arc(x, y, 10, 0, 2 * Math.PI);
-            ctx.stroke();
-            ctx.restore();
-          });
-        }
-        
-        // Update game session with new data using optimized state update
-        setGameSession(prev => normalizeGameSession({
-          ...prev,
-          clicks_used: response.data.clicks_used,
-          score: response.data.score,
-          found_risks: Array.isArray(response.data.found_risks) ? response.data.found_risks : (prev.found_risks || [])
-        }));
-
-        // Check if game should end
-        if (response.data.game_status === 'completed' || response.data.clicks_remaining <= 0) {
-          handleGameEnd();
-        }
-        
-        // Clear visual feedback and redraw zones after a delay
-        setTimeout(() => {
-          drawRiskZones(showCorrectionScreen);
-        }, 300);
+        applyClickResult(response.data, x, y, ctx);
         
       } catch (error) {
         console.error('Error handling click:', error);
@@ -940,6 +964,48 @@ const RiskHuntBuilder = () => {
     }, 50); // 50ms debounce delay
   };
 
+  // Gameplay socket: the server streams click results and its clock while a session is active
+  const gameSocket = useRef(null);
+  const clickSeq = useRef(0);
+  const pendingClicks = useRef(new Map());
+  const socketMessageHandler = useRef(null);
+
+  socketMessageHandler.current = (message) => {
+    if (message.type === 'tick') {
+      setTimeRemaining(message.time_remaining);
+    } else if (message.type === 'click') {
+      const pending = pendingClicks.current.get(message.seq);
+      pendingClicks.current.delete(message.seq);
+      if (pending) {
+        applyClickResult(message, pending.x, pending.y, pending.ctx);
+      }
+    } else if (message.type === 'game_over' && message.game_status === 'timeout') {
+      // Completion is already handled by the last click's result
+      handleGameEnd();
+    } else if (message.type === 'error') {
+      pendingClicks.current.delete(message.seq);
+      console.error('Game socket error:', message.detail);
+      showNotification('Error processing click', 'error');
+    }
+  };
+
+  useEffect(() => {
+    if (!gameSession?.id || gameSession.status !== 'active') return;
+
+    const socket = new WebSocket(`${API.replace(/^http/, 'ws')}/sessions/${gameSession.id}/ws`);
+    socket.onmessage = (event) => socketMessageHandler.current(JSON.parse(event.data));
+    socket.onclose = () => {
+      if (gameSocket.current === socket) gameSocket.current = null;
+    };
+    gameSocket.current = socket;
+
+    return () => {
+      gameSocket.current = null;
+      pendingClicks.current.clear();
+      socket.close();
+    };
+  }, [gameSession?.id, gameSession?.status]);
+
   const handleGameTimeout = async () => {
     if (!gameSession) return;
 
@@ -986,7 +1052,17 @@ const RiskHuntBuilder = () => {
     }
 
     try {
-      const response = await axios.get(`${API}/results/export/${gameId}?format=${format}`, {
+      // Exports are generated by a background job; poll it until the file is ready
+      let { data: job } = await axios.post(`${API}/exports`, { game_id: gameId, format });
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        ({ data: job } = await axios.get(`${API}/exports/${job.id}`));
+      }
+      if (job.status !== 'completed') {
+        throw new Error(job.error || 'Export failed');
+      }
+
+      const response = await axios.get(`${API}/exports/${job.id}/download`, {
         responseType: 'blob'
       });
       
@@ -1231,25 +1307,14 @@ const RiskHuntBuilder = () => {
                 onClick={() => selectImage(image.id)}
               >
                 <div className="aspect-square bg-gray-100 flex items-center justify-center">
-                  {image.image_data.startsWith('http') ? (
-                    <LazyImage
-                      src={image.image_data}
-                      alt={image.name}
-                      className="w-full h-full"
-                      onError={(e) => {
-                        e.target.src = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cmVjdCB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgZmlsbD0iI2YzZjRmNiIvPjx0ZXh0IHg9IjUwJSIgeT0iNTAlIiBmb250LXNpemU9IjE0IiBmaWxsPSIjOWNhM2FmIiB0ZXh0LWFuY2hvcj0ibWlkZGxlIiBkeT0iMC4zZW0iPkltYWdlIEVycm9yPC90ZXh0Pjwvc3ZnPg==';
-                      }}
-                    />
-                  ) : (
-                    <LazyImage
-                      src={`data:image/jpeg;base64,${image.image_data}`}
-                      alt={image.name}
-                      className="w-full h-full"
-                      onError={(e) => {
-                        e.target.src = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cmVjdCB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgZmlsbD0iI2YzZjRmNiIvPjx0ZXh0IHg9IjUwJSIgeT0iNTAlIiBmb250LXNpemU9IjE0IiBmaWxsPSIjOWNhM2FmIiB0ZXh0LWFuY2hvcj0ibWlkZGxlIiBkeT0iMC4zZW0iPkltYWdlIEVycm9yPC90ZXh0Pjwvc3ZnPg==';
-                      }}
-                    />
-                  )}
+                  <LazyImage
+                    src={resolveImageUrl(image.thumbnail_url)}
+                    alt={image.name}
+                    className="w-full h-full"
+                    onError={(e) => {
+                      e.target.src = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cmVjdCB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgZmlsbD0iI2YzZjRmNiIvPjx0ZXh0IHg9IjUwJSIgeT0iNTAlIiBmb250LXNpemU9IjE0IiBmaWxsPSIjOWNhM2FmIiB0ZXh0LWFuY2hvcj0ibWlkZGxlIiBkeT0iMC4zZW0iPkltYWdlIEVycm9yPC90ZXh0Pjwvc3ZnPg==';
+                    }}
+                  />
                 </div>
                 <div className="p-3">
                   <p className="text-sm font-medium text-gray-800 truncate" title={image.name}>
@@ -1348,37 +1413,20 @@ const RiskHuntBuilder = () => {
             
             {/* Large, high-resolution image display */}
             <div className="image-display-container max-w-4xl mx-auto">
-              {selectedImage.image_data.startsWith('http') ? (
-                <img
-                  ref={imageRef}
-                  src={selectedImage.image_data}
-                  alt={selectedImage.name}
-                  className="w-full h-auto max-h-[600px] object-contain rounded-lg shadow-md"
-                  style={{ minHeight: '400px' }}
-                  onLoad={() => {
-                    if (canvasRef.current && imageRef.current) {
-                      canvasRef.current.width = imageRef.current.width;
-                      canvasRef.current.height = imageRef.current.height;
-                      drawRiskZones();
-                    }
-                  }}
-                />
-              ) : (
-                <img
-                  ref={imageRef}
-                  src={`data:image/jpeg;base64,${selectedImage.image_data}`}
-                  alt={selectedImage.name}
-                  className="w-full h-auto max-h-[600px] object-contain rounded-lg shadow-md"
-                  style={{ minHeight: '400px' }}
-                  onLoad={() => {
-                    if (canvasRef.current && imageRef.current) {
-                      canvasRef.current.width = imageRef.current.width;
-                      canvasRef.current.height = imageRef.current.height;
-                      drawRiskZones();
-                    }
-                  }}
-                />
-              )}
+              <img
+                ref={imageRef}
+                src={resolveImageUrl(selectedImage.image_url)}
+                alt={selectedImage.name}
+                className="w-full h-auto max-h-[600px] object-contain rounded-lg shadow-md"
+                style={{ minHeight: '400px' }}
+                onLoad={() => {
+                  if (canvasRef.current && imageRef.current) {
+                    canvasRef.current.width = imageRef.current.width;
+                    canvasRef.current.height = imageRef.current.height;
+                    drawRiskZones();
+                  }
+                }}
+              />
               <canvas
                 ref={canvasRef}
                 className="absolute top-0 left-0 cursor-crosshair rounded-lg"
@@ -1666,35 +1714,19 @@ const RiskHuntBuilder = () => {
         <div className="correction-screen mb-6">
           <h3 className="text-lg font-semibold mb-4">Correction Screen - All Risks Revealed</h3>
           <div className="relative">
-            {selectedImage.image_data.startsWith('http') ? (
-              <img
-                ref={imageRef}
-                src={selectedImage.image_data}
-                alt={selectedImage.name}
-                className="max-w-full h-auto"
-                onLoad={() => {
-                  if (canvasRef.current && imageRef.current) {
-                    canvasRef.current.width = imageRef.current.width;
-                    canvasRef.current.height = imageRef.current.height;
-                    drawRiskZones(true);
-                  }
-                }}
-              />
-            ) : (
-              <img
-                ref={imageRef}
-                src={`data:image/jpeg;base64,${selectedImage.image_data}`}
-                alt={selectedImage.name}
-                className="max-w-full h-auto"
-                onLoad={() => {
-                  if (canvasRef.current && imageRef.current) {
-                    canvasRef.current.width = imageRef.current.width;
-                    canvasRef.current.height = imageRef.current.height;
-                    drawRiskZones(true);
-                  }
-                }}
-              />
-            )}
+            <img
+              ref={imageRef}
+              src={resolveImageUrl(selectedImage.image_url)}
+              alt={selectedImage.name}
+              className="max-w-full h-auto"
+              onLoad={() => {
+                if (canvasRef.current && imageRef.current) {
+                  canvasRef.current.width = imageRef.current.width;
+                  canvasRef.current.height = imageRef.current.height;
+                  drawRiskZones(true);
+                }
+              }}
+            />
             <canvas
               ref={canvasRef}
               className="absolute top-0 left-0"
@@ -1713,33 +1745,18 @@ const RiskHuntBuilder = () => {
       
       {selectedImage && gameSession && gameSession.status === 'active' && !showCorrectionScreen && (
         <div className="relative">
-          {selectedImage.image_data.startsWith('http') ? (
-            <img
-              ref={imageRef}
-              src={selectedImage.image_data}
-              alt={selectedImage.name}
-              className="max-w-full h-auto"
-              onLoad={() => {
-                if (canvasRef.current && imageRef.current) {
-                  canvasRef.current.width = imageRef.current.width;
-                  canvasRef.current.height = imageRef.current.height;
-                }
-              }}
-            />
-          ) : (
-            <img
-              ref={imageRef}
-              src={`data:image/jpeg;base64,${selectedImage.image_data}`}
-              alt={selectedImage.name}
-              className="max-w-full h-auto"
-              onLoad={() => {
-                if (canvasRef.current && imageRef.current) {
-                  canvasRef.current.width = imageRef.current.width;
-                  canvasRef.current.height = imageRef.current.height;
-                }
-              }}
-            />
-          )}
+          <img
+            ref={imageRef}
+            src={resolveImageUrl(selectedImage.image_url)}
+            alt={selectedImage.name}
+            className="max-w-full h-auto"
+            onLoad={() => {
+              if (canvasRef.current && imageRef.current) {
+                canvasRef.current.width = imageRef.current.width;
+                canvasRef.current.height = imageRef.current.height;
+              }
+            }}
+          />
           <canvas
             ref={canvasRef}
             className="absolute top-0 left-0 cursor-crosshair"
@@ -1841,7 +1858,7 @@ const RiskHuntBuilder = () => {
           <h3 className="text-lg font-semibold">
             Game Results 
             {selectedGame && ` - ${selectedGame.name}`}
-            ({(analytics?.results || results).length} entries)
+            ({analytics?.results ? analytics.total_players : results.length} entries)
           </h3>
           <div className="flex gap-2">
             <button
@@ -1901,6 +1918,17 @@ const RiskHuntBuilder = () => {
             </table>
           </div>
           
+          {analytics?.results_next_cursor && selectedGame && (
+            <div className="text-center py-4">
+              <button
+                onClick={() => loadMoreAnalyticsResults(selectedGame.id)}
+                className="text-blue-600 hover:text-blue-800 text-sm"
+              >
+                Load more results
+              </button>
+            </div>
+          )}
+
           {(analytics?.results || results).length === 0 && (
             <div className="text-center py-8">
               <p className="text-gray-500">{t('noResults')}</p>
@@ -2040,7 +2068,7 @@ const RiskHuntBuilder = () => {
                 </div>
                 <div className="stat-card bg-green-100 p-4 rounded-lg">
                   <h4 className="font-semibold text-green-800">With Risk Zones</h4>
-                  <p className="text-2xl text-green-600">{images.filter(img => img.risk_zones?.length > 0).length}</p>
+                  <p className="text-2xl text-green-600">{images.filter(img => img.risk_zone_count > 0).length}</p>
                 </div>
                 <div className="stat-card bg-yellow-100 p-4 rounded-lg">
                   <h4 className="font-semibold text-yellow-800">In Games</h4>
@@ -2083,12 +2111,12 @@ const RiskHuntBuilder = () => {
                 {images.map((image) => (
                   <div key={image.id} className="image-card bg-white border rounded-lg p-2">
                     <img
-                      src={`data:image/jpeg;base64,${image.image_data}`}
+                      src={resolveImageUrl(image.thumbnail_url)}
                       alt={image.name}
                       className="w-full h-24 object-cover rounded mb-2"
                     />
                     <p className="text-xs text-gray-600 truncate">{image.name}</p>
-                    <p className="text-xs text-gray-400">{image.risk_zones?.length || 0} zones</p>
+                    <p className="text-xs text-gray-400">{image.risk_zone_count || 0} zones</p>
                   </div>
                 ))}
               </div>
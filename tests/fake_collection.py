@@ -0,0 +1,124 @@
+"""Just enough of a Motor collection, in memory, for unit tests that exercise query logic"""
+import copy
+from types import SimpleNamespace
+
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+
+
+def _matches_condition(value, condition):
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$in":
+            ok = value in operand
+        elif operator == "$nin":
+            ok = value not in operand
+        elif operator == "$ne":
+            ok = value != operand
+        elif operator == "$gt":
+            ok = value is not None and value > operand
+        elif operator == "$lte":
+            ok = value is not None and value <= operand
+        elif operator == "$not":
+            ok = not _matches_condition(value, operand)
+        elif operator == "$exists":
+            ok = (value is not None) == operand
+        else:
+            raise NotImplementedError(operator)
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif not _matches_condition(doc.get(key), condition):
+            return False
+    return True
+
+
+def apply_update(doc, update):
+    for operator, fields in update.items():
+        for key, value in fields.items():
+            if operator == "$set":
+                doc[key] = copy.deepcopy(value)
+            elif operator == "$inc":
+                doc[key] = doc.get(key, 0) + value
+            elif operator == "$unset":
+                doc.pop(key, None)
+            else:
+                raise NotImplementedError(operator)
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = [copy.deepcopy(doc) for doc in docs]
+
+    def _first(self, query):
+        return next((doc for doc in self.docs if matches(doc, query)), None)
+
+    def _update(self, query, update, upsert=False, many=False):
+        matched = [doc for doc in self.docs if matches(doc, query)]
+        if not many:
+            matched = matched[:1]
+        for doc in matched:
+            apply_update(doc, update)
+        if not matched and upsert:
+            doc = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+            apply_update(doc, update)
+            self.docs.append(doc)
+        return len(matched)
+
+    async def find_one(self, query, projection=None):
+        doc = self._first(query)
+        return copy.deepcopy(doc)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=ReturnDocument.BEFORE):
+        doc = self._first(query)
+        if doc is None:
+            return None
+        before = copy.deepcopy(doc)
+        apply_update(doc, update)
+        return copy.deepcopy(doc) if return_document == ReturnDocument.AFTER else before
+
+    async def update_one(self, query, update, upsert=False):
+        matched = self._update(query, update, upsert)
+        return SimpleNamespace(matched_count=matched, modified_count=matched)
+
+    async def update_many(self, query, update):
+        matched = self._update(query, update, many=True)
+        return SimpleNamespace(matched_count=matched, modified_count=matched)
+
+    async def delete_one(self, query):
+        doc = self._first(query)
+        if doc is not None:
+            self.docs.remove(doc)
+        return SimpleNamespace(deleted_count=int(doc is not None))
+
+    async def delete_many(self, query):
+        removed = [doc for doc in self.docs if matches(doc, query)]
+        self.docs = [doc for doc in self.docs if doc not in removed]
+        return SimpleNamespace(deleted_count=len(removed))
+
+    async def bulk_write(self, requests, ordered=True):
+        matched = 0
+        for request in requests:
+            if isinstance(request, UpdateOne):
+                matched += self._update(request._filter, request._doc, request._upsert)
+            elif isinstance(request, ReplaceOne):
+                doc = self._first(request._filter)
+                if doc is not None:
+                    matched += 1
+                    self.docs.remove(doc)
+                if doc is not None or request._upsert:
+                    self.docs.append({"_id": request._filter["_id"], **request._doc})
+            else:
+                raise NotImplementedError(type(request).__name__)
+        return SimpleNamespace(matched_count=matched)
+
+    async def find(self, query, projection=None):
+        for doc in [doc for doc in self.docs if matches(doc, query)]:
+            yield copy.deepcopy(doc)
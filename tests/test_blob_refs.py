@@ -0,0 +1,99 @@
+"""Reference counts for shared blobs, including a writer racing a deletion"""
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import blob_store
+from blob_store import BlobRefCounter, FileSystemBlobStore, content_hash
+from tests.fake_collection import FakeCollection
+
+DATA = b"image bytes"
+HASH = content_hash(DATA)
+
+
+class BlobRefCounterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FileSystemBlobStore(self.directory.name)
+        self.collection = FakeCollection()
+        self.refs = BlobRefCounter(self.collection, self.store)
+        patcher = mock.patch.object(blob_store, "RACE_POLL_INTERVAL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def count(self, blob_hash=HASH):
+        doc = await self.collection.find_one({"_id": blob_hash})
+        return doc and doc["refs"]
+
+    async def test_bytes_are_deleted_with_the_last_reference(self):
+        await self.refs.acquire([HASH])
+        await self.store.put(DATA)
+        await self.refs.acquire_counts({HASH: 2, "": 5})
+        self.assertEqual(await self.count(), 3)
+
+        await self.refs.release([HASH, HASH])
+        self.assertTrue(await self.store.exists(HASH))
+        await self.refs.release([HASH])
+        self.assertFalse(await self.store.exists(HASH))
+        self.assertIsNone(await self.count())
+        # Releasing an unknown blob is a no-op
+        await self.refs.release([HASH, ""])
+
+    async def test_writer_waits_out_a_concurrent_deletion(self):
+        await self.refs.acquire([HASH])
+        await self.store.put(DATA)
+
+        deleting = asyncio.Event()
+        finish_delete = asyncio.Event()
+        delete = self.store.delete
+
+        async def slow_delete(blob_hash):
+            deleting.set()
+            await finish_delete.wait()
+            await delete(blob_hash)
+
+        async def writer():
+            await self.refs.acquire([HASH])
+            await self.store.put(DATA)
+
+        with mock.patch.object(self.store, "delete", slow_delete):
+            release = asyncio.create_task(self.refs.release([HASH]))
+            await deleting.wait()
+            write = asyncio.create_task(writer())
+            await asyncio.sleep(0.05)
+            # The writer has its reference but must not put before the bytes are gone
+            self.assertFalse(write.done())
+            finish_delete.set()
+            await release
+            await write
+
+        self.assertTrue(await self.store.exists(HASH))
+        self.assertEqual(await self.count(), 1)
+        self.assertNotIn("deleting", await self.collection.find_one({"_id": HASH}))
+
+    async def test_stale_deletion_flag_is_cleared(self):
+        # Left behind by a worker that died between claiming and finishing a deletion
+        self.collection.docs.append({"_id": HASH, "refs": 0, "deleting": True})
+        with mock.patch.object(blob_store, "RACE_WAIT_SECONDS", 0.05):
+            await self.refs.acquire([HASH])
+        self.assertEqual(await self.collection.find_one({"_id": HASH}), {"_id": HASH, "refs": 1})
+
+    async def test_rebuild_replaces_every_counter(self):
+        await self.refs.acquire_counts({"a": 4, "b": 1})
+        await self.refs.rebuild({"a": 1, "c": 2})
+        self.assertEqual(
+            sorted((doc["_id"], doc["refs"]) for doc in self.collection.docs),
+            [("a", 1), ("c", 2)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Local caches and cross-worker invalidation through VersionTable"""
+import asyncio
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from cache import NullCache, ReadThroughCache, TTLCache, VersionTable
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=10)
+        with mock.patch("cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("cache.time.monotonic", return_value=109.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("cache.time.monotonic", return_value=110.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class ReadThroughCacheTest(unittest.IsolatedAsyncioTestCase):
+    def make(self, values, backend=None):
+        self.loads = []
+
+        async def loader(key):
+            self.loads.append(key)
+            return values.get(key)
+
+        return ReadThroughCache("test", loader, TTLCache() if backend is None else backend)
+
+    async def test_hits_and_misses(self):
+        cache = self.make({"a": {"id": "a"}})
+        self.assertEqual(await cache.get("a"), {"id": "a"})
+        self.assertEqual(await cache.get("a"), {"id": "a"})
+        self.assertEqual(self.loads, ["a"])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (1, 1, 0.5))
+
+    async def test_missing_documents_are_not_cached(self):
+        values = {}
+        cache = self.make(values)
+        self.assertIsNone(await cache.get("a"))
+        values["a"] = {"id": "a"}
+        self.assertEqual(await cache.get("a"), {"id": "a"})
+
+    async def test_invalidate_reloads(self):
+        values = {"a": 1}
+        cache = self.make(values)
+        await cache.get("a")
+        values["a"] = 2
+        cache.invalidate("a")
+        self.assertEqual(await cache.get("a"), 2)
+
+    async def test_load_racing_a_write_is_not_stored(self):
+        release = asyncio.Event()
+
+        async def slow_loader(key):
+            await release.wait()
+            return "stale"
+
+        cache = ReadThroughCache("test", slow_loader, TTLCache())
+        load = asyncio.create_task(cache.get("a"))
+        await asyncio.sleep(0)
+        cache.put("a", "fresh")
+        release.set()
+        self.assertEqual(await load, "stale")
+        self.assertEqual(await cache.get("a"), "fresh")
+
+    async def test_null_backend_always_loads(self):
+        cache = self.make({"a": 1}, NullCache())
+        await cache.get("a")
+        await cache.get("a")
+        self.assertEqual(self.loads, ["a", "a"])
+
+
+class FakeVersions:
+    """The two operations VersionTable uses, on an in-memory collection"""
+
+    def __init__(self):
+        self.docs = {}
+        self.now = datetime(2024, 1, 1)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"], "version": 0})
+        doc["version"] += update["$inc"]["version"]
+        self.now += timedelta(seconds=1)
+        doc["changed_at"] = self.now
+
+    async def find(self, query):
+        since = query.get("changed_at", {}).get("$gte", datetime.min)
+        for doc in list(self.docs.values()):
+            if doc["changed_at"] >= since:
+                yield dict(doc)
+
+
+class VersionTableTest(unittest.IsolatedAsyncioTestCase):
+    async def test_other_workers_see_bumps(self):
+        collection = FakeVersions()
+        changed = []
+        writer = VersionTable(collection, lambda key: None)
+        reader = VersionTable(collection, changed.append)
+
+        await writer.bump("game:a")
+        # The first poll only learns the current versions
+        self.assertEqual(await reader.poll(), 0)
+        await writer.bump("game:a")
+        await writer.bump("image:b")
+        self.assertEqual(await reader.poll(), 2)
+        self.assertEqual(sorted(changed), ["game:a", "image:b"])
+        # Keys re-read inside the overlap window are not invalidated twice
+        self.assertEqual(await reader.poll(), 0)
+
+    async def test_empty_table(self):
+        reader = VersionTable(FakeVersions(), lambda key: None)
+        self.assertEqual(await reader.poll(), 0)
+        self.assertIsNotNone(reader.last_seen_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Replayed click batches are scored by when each click was made"""
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi import HTTPException
+
+import server
+from hit_testing import CompiledZones
+from server import Click, ClickBatch, click_times
+from tests.fake_collection import FakeCollection
+
+START = datetime(2024, 1, 1, 12, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+class ClickTimesTest(unittest.TestCase):
+    def test_client_timestamps_are_kept(self):
+        clicks = [Click(x=0, y=0, client_timestamp=at(5)), Click(x=0, y=0, client_timestamp=at(9))]
+        self.assertEqual(click_times(clicks, START, at(100)), [at(5), at(9)])
+
+    def test_missing_timestamps_are_now(self):
+        clicks = [Click(x=0, y=0, client_timestamp=at(5)), Click(x=0, y=0)]
+        self.assertEqual(click_times(clicks, START, at(100)), [at(5), at(100)])
+
+    def test_future_timestamps_are_capped_at_now(self):
+        clicks = [Click(x=0, y=0, client_timestamp=at(500))]
+        self.assertEqual(click_times(clicks, START, at(100)), [at(100)])
+
+    def test_aware_timestamps_are_converted_to_utc(self):
+        plus_two = timezone(timedelta(hours=2))
+        clicks = [Click(x=0, y=0, client_timestamp=at(5).replace(tzinfo=timezone.utc).astimezone(plus_two))]
+        self.assertEqual(click_times(clicks, START, at(100)), [at(5)])
+
+    def test_small_clock_skew_is_taken_as_the_start(self):
+        clicks = [Click(x=0, y=0, client_timestamp=at(-3)), Click(x=0, y=0, client_timestamp=at(4))]
+        self.assertEqual(click_times(clicks, START, at(100)), [START, at(4)])
+
+    def test_out_of_order_or_early_timestamps_are_rejected(self):
+        for seconds in ([5, 4], [-3600]):
+            clicks = [Click(x=0, y=0, client_timestamp=at(s)) for s in seconds]
+            with self.assertRaises(HTTPException) as raised:
+                click_times(clicks, START, at(100))
+            self.assertEqual(raised.exception.status_code, 400)
+
+
+class ClickBatchTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = {
+            "id": "s", "game_id": "g", "player_name": "p", "team_name": "t", "status": "active",
+            "clicks_used": 0, "score": 0, "found_risks": [], "current_image_index": 0,
+            "started_at": START, "completed_at": None
+        }
+        self.game = {"id": "g", "images": ["i"], "max_clicks": 3, "time_limit": 60}
+        self.zones = CompiledZones([{"id": "z", "type": "circle", "coordinates": [10, 10, 5], "points": 4}])
+        self.sessions = FakeCollection([self.session])
+        self.recorded = []
+
+        async def load_click_context(session_id):
+            return await self.sessions.find_one({"id": session_id}), self.game, self.zones
+
+        async def record_results(results):
+            self.recorded.extend(results)
+
+        for name, value in [
+            ("db", SimpleNamespace(sessions=self.sessions)),
+            ("load_click_context", load_click_context),
+            ("record_results", record_results),
+        ]:
+            patcher = mock.patch.object(server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def replay(self, now, *clicks):
+        batch = ClickBatch(clicks=[Click(x=x, y=y, client_timestamp=at(seconds)) for x, y, seconds in clicks])
+        with mock.patch.object(server, "datetime", mock.Mock(wraps=datetime, utcnow=lambda: now)):
+            return await server.handle_click_batch("s", batch)
+
+    async def test_offline_game_uploaded_late_is_timed_by_its_clicks(self):
+        response = await self.replay(at(600), (10, 10, 5), (0, 0, 8), (0, 0, 12))
+        self.assertEqual(response["game_status"], "completed")
+        self.assertEqual((response["score"], response["time_remaining"]), (4, 48))
+        stored = await self.sessions.find_one({"id": "s"})
+        self.assertEqual((stored["status"], stored["completed_at"]), ("completed", at(12)))
+        self.assertEqual([result.total_time_spent for result in self.recorded], [12])
+
+    async def test_clicks_after_the_deadline_are_rejected(self):
+        response = await self.replay(at(600), (10, 10, 30), (0, 0, 61))
+        self.assertEqual([result.get("message") for result in response["results"]], [None, "Game is no longer active"])
+        self.assertEqual((response["game_status"], response["clicks_used"], response["score"]), ("timeout", 1, 4))
+        stored = await self.sessions.find_one({"id": "s"})
+        self.assertEqual(stored["completed_at"], at(60))
+        self.assertEqual([result.total_time_spent for result in self.recorded], [60])
+
+    async def test_unfinished_batch_keeps_the_session_active(self):
+        response = await self.replay(at(20), (10, 10, 5), (10, 10, 6))
+        self.assertEqual((response["game_status"], response["clicks_used"], response["score"]), ("active", 2, 4))
+        self.assertEqual(response["time_remaining"], 40)
+        self.assertEqual(self.recorded, [])
+
+    async def test_session_leased_elsewhere_is_busy(self):
+        self.sessions.docs[0]["lease_until"] = at(30)
+        with self.assertRaises(HTTPException) as raised:
+            await self.replay(at(20), (10, 10, 5))
+        self.assertEqual(raised.exception.status_code, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
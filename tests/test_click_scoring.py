@@ -0,0 +1,124 @@
+"""The single-click update pipeline must score like apply_click does in memory"""
+import random
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from hit_testing import CompiledZones
+from server import apply_click, click_update_pipeline, session_state
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+def evaluate(expression, doc):
+    """The aggregation expressions click_update_pipeline uses"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = doc
+        for part in expression[1:].split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    (operator, operand), = expression.items()
+    if operator == "$literal":
+        return operand
+    if operator == "$cond":
+        condition, then, otherwise = operand
+        return evaluate(then if evaluate(condition, doc) else otherwise, doc)
+    args = evaluate(operand, doc)
+    if operator == "$arrayElemAt":
+        array, index = args
+        return array[index] if 0 <= index < len(array) else None
+    if operator == "$ifNull":
+        return args[1] if args[0] is None else args[0]
+    if operator == "$ne":
+        return args[0] != args[1]
+    if operator == "$eq":
+        return args[0] == args[1]
+    if operator == "$in":
+        return args[0] in args[1]
+    if operator == "$and":
+        return all(args)
+    if operator == "$gte":
+        return args[0] >= args[1]
+    if operator == "$add":
+        return sum(args)
+    if operator == "$concatArrays":
+        return [item for array in args for item in array]
+    raise NotImplementedError(operator)
+
+
+def run_pipeline(doc, pipeline):
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$set":
+            # Every field of a stage sees the document as it was before the stage
+            doc = {**doc, **{field: evaluate(expression, doc) for field, expression in spec.items()}}
+        elif name == "$unset":
+            doc = {key: value for key, value in doc.items() if key != spec}
+        else:
+            raise NotImplementedError(name)
+    return doc
+
+
+def zone(zone_id, x, y, points=2):
+    return {"id": zone_id, "type": "circle", "coordinates": [x, y, 10], "points": points}
+
+
+class ClickUpdatePipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.session = {
+            "id": "s", "status": "active", "clicks_used": 0, "score": 0,
+            "found_risks": [], "current_image_index": 0, "completed_at": None
+        }
+
+    def test_new_zone_scores_once(self):
+        hit = zone("a", 0, 0, points=3)
+        session = run_pipeline(self.session, click_update_pipeline([hit], 5, NOW))
+        self.assertEqual((session["clicks_used"], session["score"], session["found_risks"]), (1, 3, ["a"]))
+        self.assertNotIn("_hit", session)
+
+        session = run_pipeline(session, click_update_pipeline([hit], 5, NOW))
+        self.assertEqual((session["clicks_used"], session["score"], session["found_risks"]), (2, 3, ["a"]))
+
+    def test_miss_only_counts_the_click(self):
+        session = run_pipeline(self.session, click_update_pipeline([None], 5, NOW))
+        self.assertEqual((session["clicks_used"], session["score"], session["found_risks"]), (1, 0, []))
+        self.assertEqual(session["status"], "active")
+        self.assertIsNone(session["completed_at"])
+
+    def test_current_image_picks_the_hit(self):
+        hits = [zone("first", 0, 0), zone("second", 0, 0, points=5)]
+        session = run_pipeline({**self.session, "current_image_index": 1}, click_update_pipeline(hits, 5, NOW))
+        self.assertEqual((session["score"], session["found_risks"]), (5, ["second"]))
+
+    def test_last_click_completes_the_game(self):
+        session = run_pipeline({**self.session, "clicks_used": 4}, click_update_pipeline([None], 5, NOW))
+        self.assertEqual(session["status"], "completed")
+        self.assertEqual(session["completed_at"], NOW)
+
+    def test_agrees_with_apply_click(self):
+        random.seed(3)
+        zones = [zone(str(i), random.uniform(0, 200), random.uniform(0, 200), random.randint(1, 5)) for i in range(8)]
+        compiled = CompiledZones(zones)
+        game = {"max_clicks": 12}
+        for _ in range(20):
+            stored = dict(self.session)
+            state = session_state(self.session, time_remaining=60)
+            for _ in range(game["max_clicks"]):
+                x, y = random.uniform(0, 200), random.uniform(0, 200)
+                apply_click(state, game, compiled, x, y)
+                stored = run_pipeline(stored, click_update_pipeline([compiled.hit(x, y)], game["max_clicks"], NOW))
+                self.assertEqual(
+                    (stored["clicks_used"], stored["score"], stored["found_risks"], stored["status"]),
+                    (state["clicks_used"], state["score"], state["found_risks"], state["status"])
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Streaming export writers, fed from an async iterator standing in for the cursor"""
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import exports
+from exports import EXPORT_HEADERS, RESULT_SCHEMA, csv_chunks, ndjson_chunks, write_csv, write_ndjson, write_parquet
+
+
+def results(count):
+    return [{
+        "game_id": "g",
+        "player_name": f"Player, {i}",
+        "team_name": "Alpha" if i % 2 else "",
+        "total_score": i * 3,
+        "total_risks_found": i % 5,
+        "total_time_spent": 30 + i,
+        "total_clicks_used": i % 17,
+        "created_at": datetime(2024, 1, 1, 12, 0, i % 60, 123000),
+    } for i in range(count)]
+
+
+async def cursor(docs):
+    for doc in docs:
+        yield doc
+
+
+class ExportTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+
+class CsvExportTest(ExportTestCase):
+    async def test_chunks_hold_whole_rows(self):
+        docs = results(5)
+        with mock.patch.object(exports, "CSV_CHUNK_ROWS", 2):
+            chunks = [chunk async for chunk in csv_chunks(cursor(docs))]
+        # Header and two rows, two rows, then the last row
+        self.assertEqual([len(chunk.decode().splitlines()) for chunk in chunks], [3, 2, 1])
+
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual(rows[1], ["Player, 0", "", "0", "0", "30", "0", "2024-01-01 12:00:00.123000"])
+        self.assertEqual(len(rows), 6)
+
+    async def test_write_csv_matches_the_stream(self):
+        docs = results(1200)
+        await write_csv(cursor(docs), self.path)
+        streamed = b"".join([chunk async for chunk in csv_chunks(cursor(docs))])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), streamed)
+
+    async def test_no_results(self):
+        await write_csv(cursor([]), self.path)
+        with open(self.path, newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [EXPORT_HEADERS])
+
+
+class NdjsonExportTest(ExportTestCase):
+    async def test_one_object_per_line(self):
+        docs = results(5)
+        with mock.patch.object(exports, "NDJSON_CHUNK_LINES", 2):
+            chunks = [chunk async for chunk in ndjson_chunks(cursor(docs))]
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [2, 2, 1])
+
+        records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual(records[0], {
+            "game_id": "g", "player_name": "Player, 0", "team_name": "",
+            "total_score": 0, "total_risks_found": 0, "total_time_spent": 30, "total_clicks_used": 0,
+            "created_at": "2024-01-01T12:00:00.123000Z",
+        })
+        self.assertEqual([record["total_score"] for record in records], [doc["total_score"] for doc in docs])
+
+    async def test_missing_fields_are_null(self):
+        await write_ndjson(cursor([{"player_name": "p"}]), self.path)
+        with open(self.path) as f:
+            record = json.loads(f.read())
+        self.assertEqual(record["player_name"], "p")
+        self.assertIsNone(record["created_at"])
+        self.assertIsNone(record["total_score"])
+
+
+class ParquetExportTest(ExportTestCase):
+    async def test_round_trip(self):
+        docs = results(7) + [{"player_name": "partial"}]
+        with mock.patch.object(exports, "PARQUET_ROW_GROUP_ROWS", 3):
+            await write_parquet(cursor(docs), self.path)
+
+        parquet = pq.ParquetFile(self.path)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.schema, RESULT_SCHEMA)
+        rows = table.to_pylist()
+        self.assertEqual([row["total_score"] for row in rows], [doc.get("total_score") for doc in docs])
+        # Naive Mongo datetimes are stored as UTC
+        self.assertEqual(rows[1]["created_at"].replace(tzinfo=None), docs[1]["created_at"])
+        self.assertIsNone(rows[-1]["team_name"])
+
+    async def test_no_results(self):
+        await write_parquet(cursor([]), self.path)
+        table = pq.read_table(self.path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema, RESULT_SCHEMA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Incremental game statistics must match statistics computed from all results"""
+import random
+import statistics
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from game_stats import MEASURES, rebuild_pipeline, stats_updates, summarize
+
+
+def apply(stats, update):
+    """Fold one UpdateOne from stats_updates into an in-memory stats document"""
+    doc = update._doc
+    game = stats.setdefault(update._filter["_id"], {"_id": update._filter["_id"]})
+    for path, value in doc["$inc"].items():
+        *parents, leaf = path.split(".")
+        target = game
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = target.get(leaf, 0) + value
+    for operator, pick in (("$min", min), ("$max", max)):
+        for path, value in doc[operator].items():
+            key, leaf = path.split(".")
+            current = game.setdefault(key, {}).get(leaf)
+            game[key][leaf] = value if current is None else pick(current, value)
+
+
+def result(game_id):
+    return {
+        "game_id": game_id,
+        "total_score": random.randint(0, 150),
+        "total_time_spent": random.randint(10, 300),
+        "total_clicks_used": random.randint(1, 17),
+        "total_risks_found": random.randint(0, 15),
+    }
+
+
+class GameStatsTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(3)
+
+    def test_batches_fold_into_the_same_totals(self):
+        results = [result(random.choice("ab")) for _ in range(200)]
+        stats = {}
+        # Recorded in uneven batches, as record_results sees them
+        for start, end in ((0, 1), (1, 50), (50, 51), (51, 200)):
+            for update in stats_updates(results[start:end]):
+                apply(stats, update)
+
+        for game_id in "ab":
+            game_results = [r for r in results if r["game_id"] == game_id]
+            summary = summarize(stats[game_id])
+            self.assertEqual(summary["total_players"], len(game_results))
+            self.assertEqual(summary["total_clicks"], sum(r["total_clicks_used"] for r in game_results))
+            self.assertEqual(summary["total_risks_found"], sum(r["total_risks_found"] for r in game_results))
+            for key, field in MEASURES.items():
+                values = [r[field] for r in game_results]
+                self.assertAlmostEqual(summary[key]["mean"], round(statistics.mean(values), 2))
+                self.assertAlmostEqual(summary[key]["stddev"], round(statistics.pstdev(values), 2))
+                self.assertEqual(summary[key]["min"], min(values))
+                self.assertEqual(summary[key]["max"], max(values))
+            self.assertEqual(summary["average_score"], summary["score"]["mean"])
+
+    def test_one_upsert_per_game(self):
+        updates = stats_updates([result("a"), result("b"), result("a")])
+        self.assertEqual(sorted(update._filter["_id"] for update in updates), ["a", "b"])
+        self.assertTrue(all(update._upsert for update in updates))
+        self.assertEqual(stats_updates([]), [])
+
+    def test_single_result_has_zero_stddev(self):
+        stats = {}
+        for update in stats_updates([result("a")]):
+            apply(stats, update)
+        self.assertEqual(summarize(stats["a"])["score"]["stddev"], 0.0)
+
+    def test_rebuild_pipeline(self):
+        self.assertEqual(list(rebuild_pipeline()[-1]), ["$out"])
+        pipeline = rebuild_pipeline("a")
+        self.assertEqual(pipeline[0], {"$match": {"game_id": "a"}})
+        self.assertEqual(pipeline[-1]["$merge"]["into"], "game_stats")
+        # Never overwrite a document a concurrent $inc upsert created
+        self.assertEqual(pipeline[-1]["$merge"]["whenMatched"], "keepExisting")
+
+
+if __name__ == "__main__":
+    unittest.main()
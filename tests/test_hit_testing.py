@@ -0,0 +1,140 @@
+"""CompiledZones and the polygon tests must agree with a plain linear scan"""
+import math
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from hit_testing import (
+    CompiledZones, NUMPY_MIN_VERTICES, ZoneIndexCache,
+    point_in_polygon, point_in_polygon_python, polygon_arrays,
+)
+
+
+def outline(vertex_count, cx, cy, radius):
+    """Irregular star-shaped polygon as a flat [x1, y1, x2, y2, ...] list"""
+    coordinates = []
+    for i in range(vertex_count):
+        angle = 2 * math.pi * i / vertex_count
+        r = radius * (0.5 + 0.5 * random.random())
+        coordinates += [cx + r * math.cos(angle), cy + r * math.sin(angle)]
+    return coordinates
+
+
+def random_zone(index):
+    kind = random.choice(["circle", "rectangle", "polygon"])
+    x, y = random.uniform(0, 800), random.uniform(0, 600)
+    if kind == "circle":
+        coordinates = [x, y, random.uniform(5, 80)]
+    elif kind == "rectangle":
+        coordinates = [x, y, random.uniform(5, 150), random.uniform(5, 150)]
+    else:
+        coordinates = outline(random.choice([5, 12, NUMPY_MIN_VERTICES + 10]), x, y, random.uniform(10, 100))
+    return {"id": str(index), "type": kind, "coordinates": coordinates}
+
+
+def linear_hit(zones, x, y):
+    """The original scan: first zone in list order that contains the point"""
+    for zone in zones:
+        c = zone["coordinates"]
+        if zone["type"] == "circle" and len(c) == 3:
+            if (x - c[0]) ** 2 + (y - c[1]) ** 2 <= c[2] ** 2:
+                return zone
+        elif zone["type"] == "rectangle" and len(c) == 4:
+            if c[0] <= x <= c[0] + c[2] and c[1] <= y <= c[1] + c[3]:
+                return zone
+        elif zone["type"] == "polygon" and len(c) >= 6 and len(c) % 2 == 0:
+            if point_in_polygon_python(c, x, y):
+                return zone
+    return None
+
+
+class CompiledZonesTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+
+    def test_matches_linear_scan(self):
+        for zone_count in (1, 5, 40, 200):
+            zones = [random_zone(i) for i in range(zone_count)]
+            compiled = CompiledZones(zones)
+            for _ in range(2000):
+                x, y = random.uniform(-50, 900), random.uniform(-50, 700)
+                self.assertIs(compiled.hit(x, y), linear_hit(zones, x, y), (zone_count, x, y))
+
+    def test_first_zone_wins_when_overlapping(self):
+        zones = [
+            {"id": "outer", "type": "rectangle", "coordinates": [0, 0, 100, 100]},
+            {"id": "inner", "type": "circle", "coordinates": [50, 50, 10]},
+        ]
+        self.assertEqual(CompiledZones(zones).hit(50, 50)["id"], "outer")
+        self.assertEqual(CompiledZones(zones[::-1]).hit(50, 50)["id"], "inner")
+
+    def test_invalid_zones_are_skipped(self):
+        zones = [
+            {"id": "short", "type": "circle", "coordinates": [1, 2]},
+            {"id": "odd", "type": "polygon", "coordinates": [0, 0, 10, 0, 10]},
+            {"id": "unknown", "type": "triangle", "coordinates": [0, 0, 10, 10]},
+            {"id": "ok", "type": "rectangle", "coordinates": [0, 0, 10, 10]},
+        ]
+        compiled = CompiledZones(zones)
+        self.assertEqual(len(compiled), 1)
+        self.assertEqual(compiled.hit(5, 5)["id"], "ok")
+
+    def test_no_zones(self):
+        self.assertIsNone(CompiledZones([]).hit(10, 10))
+
+    def test_long_thin_zones_are_not_gridded(self):
+        zones = [
+            {"id": "dot", "type": "circle", "coordinates": [10, 0, 0.5]},
+            {"id": "line", "type": "rectangle", "coordinates": [0, 0, 3e6, 0]},
+            {"id": "dot after", "type": "circle", "coordinates": [50, 0, 0.5]},
+        ]
+        compiled = CompiledZones(zones)
+        self.assertEqual(compiled.oversized, [1])
+        self.assertLess(len(compiled.cells), 10)
+        for x, y in [(10, 0), (50, 0), (100, 0.5), (2e6, 0), (2e6, 1)]:
+            self.assertIs(compiled.hit(x, y), linear_hit(zones, x, y), (x, y))
+
+
+class PointInPolygonTest(unittest.TestCase):
+    def test_numpy_agrees_with_python(self):
+        random.seed(11)
+        for vertex_count in (3, 8, 64, 500):
+            coordinates = outline(vertex_count, 400, 300, 200)
+            polygon = polygon_arrays(coordinates)
+            for _ in range(1000):
+                x, y = random.uniform(150, 650), random.uniform(50, 550)
+                self.assertEqual(point_in_polygon(polygon, x, y), point_in_polygon_python(coordinates, x, y))
+
+    def test_square(self):
+        square = [0, 0, 10, 0, 10, 10, 0, 10]
+        self.assertTrue(point_in_polygon_python(square, 5, 5))
+        self.assertFalse(point_in_polygon_python(square, 15, 5))
+        self.assertTrue(point_in_polygon(polygon_arrays(square), 5, 5))
+        self.assertFalse(point_in_polygon(polygon_arrays(square), 5, -1))
+
+
+class ZoneIndexCacheTest(unittest.TestCase):
+    def test_entries_are_valid_for_one_updated_at(self):
+        cache = ZoneIndexCache()
+        zones = CompiledZones([])
+        cache.put("image", 1, zones)
+        self.assertIs(cache.get("image", 1), zones)
+        self.assertIsNone(cache.get("image", 2))
+        cache.discard("image")
+        self.assertIsNone(cache.get("image", 1))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ZoneIndexCache(maxsize=2)
+        for image_id in ("a", "b"):
+            cache.put(image_id, 1, CompiledZones([]))
+        cache.get("a", 1)
+        cache.put("c", 1, CompiledZones([]))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertIsNone(cache.get("b", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
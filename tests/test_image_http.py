@@ -0,0 +1,44 @@
+"""Range and conditional request parsing for /images/{id}/raw"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi import HTTPException
+
+from server import etag_matches, parse_range_header
+
+
+class ParseRangeHeaderTest(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range_header("bytes=0-99", 1000), (0, 100))
+        self.assertEqual(parse_range_header("bytes=500-", 1000), (500, 1000))
+        self.assertEqual(parse_range_header("bytes=-100", 1000), (900, 1000))
+        # Past the end is clamped to the size
+        self.assertEqual(parse_range_header("bytes=900-5000", 1000), (900, 1000))
+        self.assertEqual(parse_range_header("bytes=-5000", 1000), (0, 1000))
+
+    def test_ignored(self):
+        self.assertIsNone(parse_range_header("items=0-10", 1000))
+        self.assertIsNone(parse_range_header("bytes=0-10,20-30", 1000))
+        self.assertIsNone(parse_range_header("bytes=a-b", 1000))
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=1000-", "bytes=50-10"):
+            with self.assertRaises(HTTPException) as raised:
+                parse_range_header(header, 1000)
+            self.assertEqual(raised.exception.status_code, 416)
+            self.assertEqual(raised.exception.headers["Content-Range"], "bytes */1000")
+
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
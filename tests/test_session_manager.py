@@ -0,0 +1,82 @@
+"""Write-behind flushes of hot sessions and their leases"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from session_manager import SessionStateManager
+from tests.fake_collection import FakeCollection
+
+
+def session(session_id):
+    return {"id": session_id, "status": "active", "clicks_used": 0, "found_risks": [], "score": 0}
+
+
+class SessionStateManagerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.collection = FakeCollection([session("a"), session("b")])
+        self.manager = SessionStateManager(self.collection)
+
+    async def stored(self, session_id):
+        return await self.collection.find_one({"id": session_id})
+
+    async def test_one_worker_holds_a_session(self):
+        hot = await self.manager.acquire("a")
+        self.assertEqual(hot.session["owner"], self.manager.worker_id)
+        self.assertIs(await self.manager.acquire("a"), hot)
+        self.assertEqual(hot.connections, 2)
+        self.assertIsNone(await SessionStateManager(self.collection).acquire("a"))
+
+    async def test_flush_writes_dirty_sessions(self):
+        hot = await self.manager.acquire("a")
+        await self.manager.acquire("b")
+        hot.session.update(clicks_used=2, score=5, found_risks=["z"])
+        self.manager.mark_dirty("a")
+
+        # "b" is clean and its lease is fresh, so only "a" is written
+        self.assertEqual(await self.manager.flush(), {"a"})
+        stored = await self.stored("a")
+        self.assertEqual((stored["clicks_used"], stored["score"], stored["found_risks"]), (2, 5, ["z"]))
+        self.assertEqual(await self.manager.flush(), set())
+
+    async def test_session_finished_elsewhere_is_dropped(self):
+        for session_id in ("a", "b"):
+            await self.manager.acquire(session_id)
+            self.manager.mark_dirty(session_id)
+            self.manager.get(session_id).session["clicks_used"] = 3
+        # The lease on "a" lapsed and the sweeper timed it out
+        await self.collection.update_one({"id": "a"}, {"$set": {"status": "timeout", "clicks_used": 1}})
+
+        self.assertEqual(await self.manager.flush(), {"b"})
+        self.assertIsNone(self.manager.get("a"))
+        self.assertIsNotNone(self.manager.get("b"))
+        stored = await self.stored("a")
+        self.assertEqual((stored["status"], stored["clicks_used"]), ("timeout", 1))
+        self.assertEqual((await self.stored("b"))["clicks_used"], 3)
+
+    async def test_session_taken_over_is_dropped(self):
+        await self.manager.acquire("a")
+        self.manager.mark_dirty("a")
+        await self.collection.update_one({"id": "a"}, {"$set": {"owner": "another worker"}})
+        self.assertEqual(await self.manager.flush(["a"]), set())
+        self.assertIsNone(self.manager.get("a"))
+
+    async def test_last_release_flushes_and_gives_up_the_lease(self):
+        hot = await self.manager.acquire("a")
+        await self.manager.acquire("a")
+        hot.session["score"] = 7
+        self.manager.mark_dirty("a")
+
+        await self.manager.release("a")
+        self.assertIs(self.manager.get("a"), hot)
+        await self.manager.release("a")
+        self.assertIsNone(self.manager.get("a"))
+        stored = await self.stored("a")
+        self.assertEqual(stored["score"], 7)
+        self.assertNotIn("owner", stored)
+        self.assertNotIn("lease_until", stored)
+
+
+if __name__ == "__main__":
+    unittest.main()